@@ -3,17 +3,30 @@ import pytest
 from datetime import datetime, timedelta
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.urls import reverse
 
 from news.models import News, Comment
 from news.forms import BAD_WORDS
+from news.pytest_tests.query_budget import QueryBudget
 
 NEWS_DETAIL_URL = 'news:detail'
 NEWS_DELETE_URL = 'news:delete'
 NEWS_EDIT_URL = 'news:edit'
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """QueryBudget: with query_budget(3): client.get(url)."""
+    return QueryBudget
+
+
 @pytest.fixture
 def author(django_user_model):
     return django_user_model.objects.create(username='Автор')
@@ -13,3 +13,9 @@ class NewsAdmin(admin.ModelAdmin):
     inlines = [
         CommentInline,
     ]
+    readonly_fields = ('comment_count',)
+
+    def save_related(self, request, form, formsets, change):
+        """После правки комментариев в админке сверяем счётчик."""
+        super().save_related(request, form, formsets, change)
+        News.objects.filter(pk=form.instance.pk).refresh_comment_count()
@@ -1,7 +1,14 @@
 from django.apps import AppConfig
 
+# Префикс настроек приложения. Через него читают настройки модули,
+# общие для ya_news и ya_note: metrics, profiling и timing.
+SETTINGS_PREFIX = 'NEWS'
+
 
 class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
     verbose_name = 'Новости'
+
+    def ready(self):
+        from . import signals  # noqa: F401
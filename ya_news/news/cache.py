@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+HOME_VERSION_KEY = 'news:home:version'
+HOME_CHANGED_KEY = 'news:home:changed'
+HOME_PAGE_KEY = 'news:home:page'
+
+
+def get_home_version():
+    """Текущая версия кеша главной страницы.
+
+    Если ключ версии вытеснен из кеша, новая версия берётся из текущего
+    времени, чтобы не совпасть ни с одной из ранее выданных.
+    """
+    version = cache.get(HOME_VERSION_KEY)
+    if version is None:
+        cache.add(HOME_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(HOME_VERSION_KEY)
+    return version
+
+
+def increment_home_version():
+    cache.set(HOME_CHANGED_KEY, timezone.now(), None)
+    try:
+        cache.incr(HOME_VERSION_KEY)
+    except ValueError:
+        get_home_version()
+
+
+def bump_home_version():
+    """Делает устаревшими все закешированные варианты главной страницы.
+
+    Версия меняется сразу и ещё раз после фиксации транзакции: иначе
+    страница, собранная до фиксации по старым данным, осталась бы
+    в кеше под новой версией.
+    """
+    increment_home_version()
+    transaction.on_commit(increment_home_version)
+
+
+def get_home_changed():
+    """Время последнего изменения новостей или комментариев.
+
+    Если оно неизвестно, считаем, что изменения были только что.
+    """
+    changed = cache.get(HOME_CHANGED_KEY)
+    if changed is None:
+        changed = timezone.now()
+        cache.add(HOME_CHANGED_KEY, changed, None)
+    return changed
+
+
+def get_home_page(version):
+    return cache.get(HOME_PAGE_KEY, version=version)
+
+
+def set_home_page(version, content):
+    cache.set(
+        HOME_PAGE_KEY, content, settings.NEWS_HOME_CACHE_TIMEOUT,
+        version=version
+    )
@@ -0,0 +1,95 @@
+"""ETag и Last-Modified для условных GET-запросов к страницам новостей.
+
+Значения считаются без рендеринга шаблонов: для главной — по версии
+кеша, для страницы новости — одним запросом по индексам.
+"""
+from hashlib import md5
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .cache import get_home_changed, get_home_version
+from .models import Comment, News
+
+
+def make_etag(*parts):
+    return md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def user_part(request):
+    """Часть ETag, зависящая от пользователя.
+
+    Шапка страницы зависит от пользователя, а формы для авторизованного
+    несут CSRF-токен, который меняется при каждом входе: без него 304
+    оставил бы у клиента страницу со старым токеном.
+    """
+    if not request.user.is_authenticated:
+        return None
+    return request.user.pk, request.META.get('CSRF_COOKIE')
+
+
+def home_etag(request, *args, **kwargs):
+    return make_etag(get_home_version(), user_part(request))
+
+
+def get_last_modified():
+    """Время последней записи новостей или комментариев.
+
+    Last-Modified передаётся с точностью до секунды, поэтому, пока
+    текущая секунда не закончилась, в ней возможна ещё одна запись:
+    ответ с такой отметкой получил бы 304 и после неё. В этом случае
+    Last-Modified не отдаётся и остаётся только ETag.
+    """
+    changed = get_home_changed()
+    if int(changed.timestamp()) >= int(timezone.now().timestamp()):
+        return None
+    return changed
+
+
+def user_last_modified(request):
+    # CSRF-токен в Last-Modified не отражается, поэтому
+    # авторизованным пользователям остаётся только ETag.
+    if request.user.is_authenticated:
+        return None
+    return get_last_modified()
+
+
+def home_last_modified(request, *args, **kwargs):
+    return user_last_modified(request)
+
+
+def get_news_state(request, pk):
+    """Дата новости, число и время последнего комментария.
+
+    Результат запоминается в запросе, чтобы ETag и Last-Modified
+    обошлись одним обращением к базе.
+    """
+    if not hasattr(request, '_news_state'):
+        last_comment = Comment.objects.filter(
+            news=OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+        states = News.objects.filter(pk=pk).order_by().values(
+            'date', 'comment_count'
+        ).annotate(last_comment=Subquery(last_comment))
+        request._news_state = next(iter(states), None)
+    return request._news_state
+
+
+def detail_etag(request, pk):
+    state = get_news_state(request, pk)
+    if state is None:
+        return None
+    # Версия кеша учитывает правку и удаление комментариев,
+    # которые не меняют время последнего из них.
+    return make_etag(
+        pk, state['date'], state['last_comment'], state['comment_count'],
+        get_home_version(), user_part(request)
+    )
+
+
+def detail_last_modified(request, pk):
+    # Дата новости и время последнего комментария не меняются при
+    # правке и удалении комментариев, поэтому берётся время записи.
+    if get_news_state(request, pk) is None:
+        return None
+    return user_last_modified(request)
@@ -0,0 +1,74 @@
+"""Потоковая выгрузка новостей и комментариев.
+
+Строки читаются из базы курсором пачками и сразу сериализуются,
+поэтому расход памяти не зависит от размера таблиц.
+"""
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, News
+
+CHUNK_SIZE = 2000
+
+TABLES = {
+    'news': (
+        News, ('id', 'title', 'text', 'date', 'comment_count')
+    ),
+    'comments': (
+        Comment, ('id', 'news_id', 'author__username', 'text', 'created')
+    ),
+}
+FORMATS = ('csv', 'jsonl')
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает записанное вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(table, chunk_size=CHUNK_SIZE):
+    model, fields = TABLES[table]
+    return model.objects.order_by('pk').values(*fields).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def iter_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields).encode()
+    for row in rows:
+        yield writer.writerow(row[field] for field in fields).encode()
+
+
+def iter_jsonl(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield (encoder.encode(row) + '\n').encode()
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(table, data_format, compress=False, chunk_size=CHUNK_SIZE):
+    """Байтовые куски выгрузки таблицы в CSV или JSONL, при желании gzip."""
+    rows = iter_rows(table, chunk_size)
+    if data_format == 'csv':
+        chunks = iter_csv(rows, TABLES[table][1])
+    else:
+        chunks = iter_jsonl(rows)
+    return iter_gzip(chunks) if compress else chunks
+
+
+def export_filename(table, data_format, compress=False):
+    filename = f'{table}.{data_format}'
+    return f'{filename}.gz' if compress else filename
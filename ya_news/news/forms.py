@@ -2,6 +2,7 @@ from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .profanity import get_matcher
 
 BAD_WORDS = (
     'редиска',
@@ -12,6 +13,7 @@ WARNING = 'Не ругайтесь!'
 
 
 class CommentForm(ModelForm):
+    bad_words = frozenset()
 
     class Meta:
         model = Comment
@@ -20,8 +22,11 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        self.bad_words = get_matcher(BAD_WORDS).find(text)
+        if self.bad_words:
+            raise ValidationError(
+                WARNING,
+                code='bad_words',
+                params={'words': sorted(self.bad_words)}
+            )
         return text
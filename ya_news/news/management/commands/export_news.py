@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from news.export import CHUNK_SIZE, FORMATS, TABLES, export
+
+
+class Command(BaseCommand):
+    """Потоковая выгрузка новостей или комментариев."""
+    help = 'Выгружает новости или комментарии в CSV или JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=TABLES)
+        parser.add_argument(
+            '--format', choices=FORMATS, default='jsonl',
+            help='Формат выгрузки.'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать выгрузку gzip.'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        chunks = export(
+            options['table'], options['format'], options['gzip'],
+            options['chunk_size']
+        )
+        if options['output'] == '-':
+            self.write_chunks(chunks, sys.stdout.buffer)
+        else:
+            with open(options['output'], 'wb') as file:
+                self.write_chunks(chunks, file)
+
+    def write_chunks(self, chunks, file):
+        for chunk in chunks:
+            file.write(chunk)
+        file.flush()
@@ -0,0 +1,239 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_date
+
+from news.cache import bump_home_version
+from news.models import Comment, News
+
+BATCH_SIZE = 1000
+USER_CACHE_SIZE = 10000
+# Запас до лимита SQLite на число параметров в одном запросе.
+MAX_QUERY_PARAMS = 500
+ID_ATTEMPTS = 3
+
+User = get_user_model()
+
+
+class UserCache:
+    """id пользователей по username, подгружаемые пачками.
+
+    Неизвестные имена тоже запоминаются, чтобы не искать их повторно.
+    Кеш сбрасывается при переполнении, так что память ограничена.
+    """
+
+    def __init__(self, max_size=USER_CACHE_SIZE):
+        self.max_size = max_size
+        self.ids = {}
+
+    def load(self, usernames):
+        missing = set(usernames) - self.ids.keys()
+        if len(self.ids) + len(missing) > self.max_size:
+            self.ids.clear()
+        missing = list(missing)
+        for start in range(0, len(missing), MAX_QUERY_PARAMS):
+            names = missing[start:start + MAX_QUERY_PARAMS]
+            self.ids.update(dict.fromkeys(names))
+            self.ids.update(
+                User.objects.filter(
+                    username__in=names
+                ).values_list('username', 'pk')
+            )
+
+    def get(self, username):
+        return self.ids.get(username)
+
+
+def read_jsonl(file):
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {line_number}: {error}')
+        yield line_number, record
+
+
+def read_csv(file):
+    reader = csv.DictReader(file)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def check_fields(record, required, optional=()):
+    """Первая ошибка в полях записи или None."""
+    if not isinstance(record, dict):
+        return 'ожидается объект'
+    for field in required:
+        # csv.DictReader ставит None вместо недостающих столбцов.
+        if record.get(field) is None:
+            return f'нет обязательного поля {field!r}'
+    for field in (*required, *optional):
+        if not isinstance(record.get(field) or '', str):
+            return f'поле {field!r} должно быть строкой'
+    return None
+
+
+def parse_news_date(value):
+    """Дата из строки ГГГГ-ММ-ДД или None, если строка некорректна."""
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def find_error(record):
+    error = check_fields(record, ('title', 'text'), ('date',))
+    if error is not None:
+        return error
+    if record.get('date') and parse_news_date(record['date']) is None:
+        return f'некорректная дата {record["date"]!r}'
+    comments = record.get('comments') or []
+    if not isinstance(comments, list):
+        return "поле 'comments' должно быть списком"
+    for index, comment in enumerate(comments, 1):
+        error = check_fields(comment, ('text',), ('author',))
+        if error is not None:
+            return f'комментарий {index}: {error}'
+    return None
+
+
+def validate_record(line_number, record):
+    """Проверяет запись при чтении, чтобы ошибка называла строку."""
+    error = find_error(record)
+    if error is not None:
+        raise CommandError(f'Строка {line_number}: {error}')
+    return record
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+class Command(BaseCommand):
+    """Потоковый импорт новостей с комментариями."""
+    help = (
+        'Импортирует новости из JSONL или CSV (файл или stdin). '
+        'Строка JSONL: {"title", "text", "date", "comments": '
+        '[{"author": username, "text"}]}; в CSV только title, text, date. '
+        'Временем комментариев становится время импорта, порядок '
+        'комментариев сохраняется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Файл для импорта; «-» или без аргумента — stdin.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат данных; по умолчанию — по расширению файла.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько новостей записывать в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        self.users = UserCache()
+        self.news_count = self.comments_count = self.skipped_count = 0
+        started = time.monotonic()
+        if path == '-':
+            self.import_records(READERS[data_format](sys.stdin), options)
+        else:
+            with open(path, encoding='utf-8', newline='') as file:
+                self.import_records(READERS[data_format](file), options)
+        bump_home_version()
+        elapsed = time.monotonic() - started
+        rows = self.news_count + self.comments_count
+        self.stdout.write(self.style.SUCCESS(
+            f'Новостей: {self.news_count}, '
+            f'комментариев: {self.comments_count}, '
+            f'пропущено комментариев: {self.skipped_count}; '
+            f'{rows / max(elapsed, 1e-6):.0f} строк/с'
+        ))
+
+    def import_records(self, records, options):
+        batch_size = options['batch_size']
+        while True:
+            batch = [
+                validate_record(line_number, record)
+                for line_number, record in islice(records, batch_size)
+            ]
+            if not batch:
+                break
+            self.import_batch(batch)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Записано новостей: {self.news_count}')
+
+    def import_batch(self, records):
+        self.users.load(
+            comment.get('author')
+            for record in records
+            for comment in record.get('comments') or ()
+        )
+        news = []
+        comments = []
+        for record in records:
+            item = self.make_news(record)
+            for comment in record.get('comments') or ():
+                author_id = self.users.get(comment.get('author'))
+                if author_id is None:
+                    self.skipped_count += 1
+                    continue
+                comments.append(Comment(
+                    news=item, author_id=author_id, text=comment['text']
+                ))
+                item.comment_count += 1
+            news.append(item)
+        for attempt in range(ID_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    self.save_batch(news, comments)
+                break
+            except IntegrityError:
+                # Кто-то занял выделенные id, пробуем заново.
+                if attempt == ID_ATTEMPTS - 1:
+                    raise
+        self.news_count += len(news)
+        self.comments_count += len(comments)
+
+    def make_news(self, record):
+        item = News(
+            title=record['title'][:News._meta.get_field('title').max_length],
+            text=record['text']
+        )
+        if record.get('date'):
+            item.date = parse_news_date(record['date'])
+        return item
+
+    def save_batch(self, news, comments):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # Без RETURNING bulk_create не сообщает id новостей,
+            # поэтому выдаём их сами вслед за последним.
+            last_id = News.objects.aggregate(last=Max('pk'))['last'] or 0
+            for offset, item in enumerate(news, 1):
+                item.pk = last_id + offset
+        News.objects.bulk_create(news)
+        for comment in comments:
+            comment.news_id = comment.news.pk
+        Comment.objects.bulk_create(comments)
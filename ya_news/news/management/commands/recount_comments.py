@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news.models import News
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованный счётчик комментариев у новостей."""
+    help = 'Пересчитывает поле comment_count у всех новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько новостей обновлять одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = News.objects.order_by('pk').values_list('pk', flat=True)
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += News.objects.filter(
+                    pk__gte=batch[0], pk__lte=batch[-1]
+                ).refresh_comment_count()
+            last_id = batch[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено новостей: {updated}')
+        )
@@ -1,16 +1,42 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def refresh_comment_count(self):
+        """Пересчитывает счётчик комментариев одним UPDATE-запросом."""
+        comments = Comment.objects.filter(
+            news=OuterRef('pk')
+        ).order_by().values('news').annotate(
+            total=Count('pk')
+        ).values('total')
+        return self.update(
+            comment_count=Coalesce(Subquery(comments), 0)
+        )
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('date',), name='news_date_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -32,6 +58,27 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # Счётчик сдвигается до записи комментария, чтобы к моменту
+        # сигнала post_save новость уже была актуальной.
+        with transaction.atomic():
+            self._change_comment_count(1)
+            super().save(*args, **kwargs)
+
+    def _change_comment_count(self, delta):
+        """Атомарно сдвигает счётчик комментариев новости на delta."""
+        News.objects.filter(pk=self.news_id).update(
+            comment_count=F('comment_count') + delta
+        )
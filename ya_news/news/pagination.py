@@ -0,0 +1,24 @@
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Больше не помещается в целое SQLite и поднимает OverflowError.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(comment):
+    """Курсор на комментарий — пара (created, id) в base64."""
+    value = f'{comment.created.isoformat()}|{comment.pk}'
+    return urlsafe_base64_encode(value.encode())
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; при любой ошибке поднимает ValueError."""
+    try:
+        created, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        created = None
+    if created is None or not 0 < pk <= MAX_PK:
+        raise ValueError(f'Некорректный курсор: {cursor!r}')
+    return created, pk
@@ -0,0 +1,101 @@
+"""Поиск запрещённых слов в тексте за один проход (Aho-Corasick)."""
+import os
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+
+
+class WordMatcher:
+    """Автомат Ахо-Корасик по набору слов.
+
+    Строится один раз; поиск проходит по тексту один раз, и его время
+    не зависит от количества слов в словаре.
+    """
+
+    def __init__(self, words):
+        self.words = frozenset(word.lower() for word in words if word)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for word in self.words:
+            self._add(word)
+        self._link()
+
+    def _add(self, word):
+        node = 0
+        for char in word:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node] += (word,)
+
+    def _link(self):
+        """Проставляет суффиксные ссылки обходом бора в ширину."""
+        goto, fail, output = self._goto, self._fail, self._output
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                output[child] += output[fail[child]]
+
+    def find(self, text):
+        """Множество слов словаря, встретившихся в тексте."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+def read_words(path):
+    """Слова из файла: по одному в строке, строки с # пропускаются."""
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            word = line.strip()
+            if word and not word.startswith('#'):
+                yield word
+
+
+@lru_cache(maxsize=1)
+def _build_matcher(words, path, mtime, size):
+    if path is not None:
+        try:
+            words = (*words, *read_words(path))
+        except OSError:
+            pass
+    return WordMatcher(words)
+
+
+def get_matcher(words):
+    """Автомат по словам и файлу settings.BAD_WORDS_FILE.
+
+    Автомат перестраивается только при изменении файла со словами.
+    Пока файл недоступен (например, при ротации), проверка идёт
+    по встроенным словам, а не роняет отправку комментария.
+    """
+    path = getattr(settings, 'BAD_WORDS_FILE', None)
+    mtime = size = None
+    if path is not None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            path = None
+        else:
+            mtime, size = stat.st_mtime_ns, stat.st_size
+    return _build_matcher(tuple(words), path, mtime, size)
@@ -0,0 +1,107 @@
+"""Ограничение числа SQL-запросов в тестах.
+
+QueryBudget работает и как контекстный менеджер, и как декоратор
+тестовой функции или метода TestCase:
+
+    with QueryBudget(3):
+        client.get(url)
+
+    @QueryBudget(3)
+    def test_home(self): ...
+
+При превышении бюджета тест падает со списком запросов,
+сгруппированных по месту вызова: строке шаблона или кода проекта,
+из которой запрос был сделан. Так N+1 в шаблоне виден сразу.
+"""
+import os
+import sys
+from collections import Counter, defaultdict
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PROJECT_DIR = str(settings.BASE_DIR)
+DJANGO_DB = os.path.join('django', 'db', '')
+# Сколько примеров SQL показывать для одного места вызова.
+SAMPLES_PER_SITE = 3
+
+
+def is_project_file(filename):
+    return (
+        filename.startswith(PROJECT_DIR)
+        and 'site-packages' not in filename
+        and filename != __file__
+    )
+
+
+def short_name(filename):
+    return filename.rpartition('site-packages/')[2]
+
+
+def call_site(frame):
+    """Ближайшая к запросу строка шаблона или кода проекта.
+
+    Для запросов из кода библиотек, например сессий, к строке проекта
+    добавляется строка библиотеки, сделавшая запрос.
+    """
+    library = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated':
+            node = frame.f_locals['self']
+            return f'{node.origin.template_name}:{node.token.lineno}'
+        if is_project_file(code.co_filename):
+            filename = code.co_filename[len(PROJECT_DIR) + 1:]
+            site = f'{filename}:{frame.f_lineno} ({code.co_name})'
+            return site if library is None else f'{site} <- {library}'
+        if library is None and not (
+                DJANGO_DB in code.co_filename or code.co_filename == __file__
+        ):
+            library = (
+                f'{short_name(code.co_filename)}:{frame.f_lineno} '
+                f'({code.co_name})'
+            )
+        frame = frame.f_back
+    return library or 'вне проекта'
+
+
+class QueryBudget(ContextDecorator):
+    """Падает, если в блоке сделано больше max_queries запросов."""
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.connection = connections[using]
+
+    def record(self, execute, sql, params, many, context):
+        self.queries.append((call_site(sys._getframe(1)), sql))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.queries = []
+        self.wrapper = self.connection.execute_wrapper(self.record)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wrapper.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self.queries) > self.max_queries:
+            raise AssertionError(self.report())
+
+    def report(self):
+        sites = defaultdict(list)
+        for site, sql in self.queries:
+            sites[site].append(sql)
+        lines = [
+            f'Запросов {len(self.queries)}, '
+            f'бюджет {self.max_queries}. По местам вызова:'
+        ]
+        for site, queries in sorted(
+            sites.items(), key=lambda item: -len(item[1])
+        ):
+            lines.append(f'{len(queries)} x {site}')
+            for sql, count in Counter(queries).most_common(
+                SAMPLES_PER_SITE
+            ):
+                lines.append(f'    [{count}] {sql}')
+        return '\n'.join(lines)
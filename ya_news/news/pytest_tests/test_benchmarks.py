@@ -0,0 +1,68 @@
+"""Замеры производительности.
+
+Не входят в обычный прогон тестов, запускаются так:
+BENCHMARK=1 pytest -s news/pytest_tests/test_benchmarks.py
+"""
+import json
+import os
+import random
+import string
+from io import StringIO
+from timeit import timeit
+
+import pytest
+from django.core.management import call_command
+
+from news.profanity import WordMatcher
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('BENCHMARK'), reason='Нужна переменная BENCHMARK.'
+)
+
+LETTERS = string.ascii_lowercase + 'абвгдежзийклмнопрстуфхцчшщъыьэюя'
+
+
+def random_words(count, length=8, seed=0):
+    rand = random.Random(seed)
+    return [
+        ''.join(rand.choices(LETTERS, k=length)) for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize('words_count', (2, 1_000, 20_000))
+@pytest.mark.parametrize('text_length', (1_000, 100_000))
+def test_word_matcher_vs_naive_scan(words_count, text_length):
+    """Автомат против поиска каждого слова через `in`."""
+    words = random_words(words_count)
+    text = ' '.join(random_words(text_length // 9, seed=1))
+    build_time = timeit(lambda: WordMatcher(words), number=1)
+    matcher = WordMatcher(words)
+    matcher_time = timeit(lambda: matcher.find(text), number=3) / 3
+    lowered_text = text.lower()
+    naive_time = timeit(
+        lambda: [word for word in words if word in lowered_text], number=1
+    )
+    print(
+        f'\nслов: {words_count}, символов: {text_length}; '
+        f'построение {build_time:.4f} c, автомат {matcher_time:.4f} c, '
+        f'перебор {naive_time:.4f} c'
+    )
+
+
+@pytest.mark.django_db
+def test_import_news_throughput(author, tmp_path):
+    """Скорость команды import_news на 20 000 новостей с комментариями."""
+    data_file = tmp_path / 'news.jsonl'
+    with open(data_file, 'w', encoding='utf-8') as file:
+        for index in range(20_000):
+            record = {
+                'title': f'Новость {index}',
+                'text': 'Текст ' * 50,
+                'comments': [
+                    {'author': author.username, 'text': 'Комментарий'}
+                ] * 3,
+            }
+            file.write(json.dumps(record) + '\n')
+    out = StringIO()
+    call_command('import_news', str(data_file), stdout=out)
+    print('\n' + out.getvalue())
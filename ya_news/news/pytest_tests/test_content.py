@@ -1,8 +1,14 @@
+from http import HTTPStatus
+
 import pytest
 from django.conf import settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
 
+from news.cache import get_home_version
 from news.forms import CommentForm
+from news.models import Comment
 
 HOME_URL = reverse('news:home')
 
@@ -61,3 +67,116 @@ def test_anonymous_client_has_no_form(client,
     """
     response = client.get(news_detail_url)
     assert 'form' not in response.context
+
+
+@pytest.mark.django_db
+def test_home_page_shows_comment_count(client, comments,
+                                       django_assert_num_queries):
+    """Главная страница берёт количество комментариев из счётчика
+    новости и не загружает сами комментарии.
+    """
+    with django_assert_num_queries(1):
+        response = client.get(HOME_URL)
+    news = response.context['object_list'][0]
+    assert news.comment_count == len(comments)
+    assert f'Комментариев: {len(comments)}' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_home_page_cached_for_anonymous(client, all_news,
+                                        django_assert_num_queries):
+    """Повторный анонимный запрос главной отдаётся из кеша
+    без запросов к базе и без рендеринга шаблона.
+    """
+    content = client.get(HOME_URL).content
+    with django_assert_num_queries(0):
+        response = client.get(HOME_URL)
+    assert response.context is None
+    assert response.content == content
+
+
+@pytest.mark.django_db
+def test_home_page_cache_invalidated_by_comment(client, news, author):
+    """Новый комментарий сбрасывает кеш главной страницы."""
+    client.get(HOME_URL)
+    Comment.objects.create(news=news, author=author, text='Текст')
+    response = client.get(HOME_URL)
+    assert 'Комментариев: 1' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_home_page_cached_list_for_authorized(author_client, author,
+                                              all_news,
+                                              django_assert_num_queries):
+    """Авторизованному пользователю список новостей отдаётся из кеша,
+    а шапка с его именем рендерится заново.
+    """
+    author_client.get(HOME_URL)
+    # Запросы сессии и пользователя, без запроса новостей.
+    with django_assert_num_queries(2):
+        response = author_client.get(HOME_URL)
+    content = response.content.decode()
+    assert author.username in content
+    assert 'Новость 0' in content
+
+
+@pytest.mark.django_db
+def test_comments_paginated_by_cursor(client, settings, news, author,
+                                      news_detail_url,
+                                      django_assert_num_queries):
+    """Комментарии выдаются страницами, следующая страница
+    подгружается фрагментом по курсору из предыдущей.
+    """
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    now = timezone.now()
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index in range(5)
+    )
+    Comment.objects.update(created=now)
+    with django_assert_num_queries(3):
+        response = client.get(news_detail_url)
+    pages = [response.context['comments']]
+    next_cursor = response.context['next_cursor']
+    comments_url = reverse('news:comments', args=(news.id,))
+    while next_cursor:
+        response = client.get(comments_url, {'after': next_cursor})
+        pages.append(response.context['comments'])
+        next_cursor = response.context['next_cursor']
+    assert [len(page) for page in pages] == [2, 2, 1]
+    all_ids = [comment.id for page in pages for comment in page]
+    assert all_ids == sorted(Comment.objects.values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_comments_bad_cursor(client, news):
+    """Некорректный курсор приводит к ошибке 404."""
+    comments_url = reverse('news:comments', args=(news.id,))
+    huge_pk = urlsafe_base64_encode(
+        f'{timezone.now().isoformat()}|{10 ** 20}'.encode()
+    )
+    for cursor in ('мусор', huge_pk):
+        response = client.get(comments_url, {'after': cursor})
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_comments_of_missing_news(client, news):
+    """Комментарии несуществующей новости дают 404, пустой — 200."""
+    response = client.get(reverse('news:comments', args=(news.id,)))
+    assert response.status_code == HTTPStatus.OK
+    response = client.get(reverse('news:comments', args=(news.id + 1,)))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_home_version_bumped_again_on_commit(
+    news, author, django_capture_on_commit_callbacks
+):
+    """Версия кеша главной меняется и после фиксации транзакции,
+    чтобы страница, собранная до фиксации, не осталась в кеше.
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(news=news, author=author, text='Текст')
+        before_commit = get_home_version()
+    assert get_home_version() != before_commit
@@ -1,13 +1,42 @@
+import gzip
+import json
+import multiprocessing
+import os
+import pstats
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from pytest_django.asserts import assertRedirects, assertFormError
 from django.urls import reverse
 
-from news.models import Comment
-from news.forms import WARNING
+from news.models import Comment, News
+from news.forms import BAD_WORDS, WARNING, CommentForm
+from news.metrics import Counter, Histogram, Registry, render
+from news.profiling import make_profile_token
+from news.profanity import WordMatcher
 
 LOGIN_URL = reverse('users:login')
+DETAIL_URL = pytest.lazy_fixture('news_detail_url')
+EDIT_URL = pytest.lazy_fixture('news_edit_url')
+DELETE_URL = pytest.lazy_fixture('news_delete_url')
+HOME_URL = reverse('news:home')
+METRICS_URL = reverse('metrics')
+PROFILES_URL = reverse('news:profiles')
+FORM_DATA = pytest.lazy_fixture('form_data')
+# Файлы, одинаковые в ya_news и ya_note, пути от каталога проектов.
+SHARED_FILES = (
+    ('ya_news/news/metrics.py', 'ya_note/notes/metrics.py'),
+    ('ya_news/news/profiling.py', 'ya_note/notes/profiling.py'),
+    ('ya_news/news/timing.py', 'ya_note/notes/timing.py'),
+    ('ya_news/news/pytest_tests/query_budget.py',
+     'ya_note/notes/tests/query_budget.py'),
+    ('ya_news/templates/news/profiles.html',
+     'ya_note/templates/notes/profiles.html'),
+)
 
 
 @pytest.mark.django_db
@@ -99,3 +128,352 @@ def test_user_cant_delete_comment_of_another_user(admin_client,
     assert response.status_code == HTTPStatus.NOT_FOUND
     comment_from_db = Comment.objects.get(id=comment.id)
     assert comment.text == comment_from_db.text
+
+
+def test_comment_count_follows_create_and_delete(author_client, news,
+                                                 news_detail_url,
+                                                 form_data):
+    """Счётчик комментариев новости меняется при добавлении
+    и удалении комментария.
+    """
+    author_client.post(news_detail_url, data=form_data)
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    comment = Comment.objects.get()
+    author_client.post(reverse('news:delete', args=(comment.id,)))
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_comment_count_follows_cascade_delete(news, comments, author):
+    """Удаление автора вместе с комментариями уменьшает счётчик."""
+    news.refresh_from_db()
+    assert news.comment_count == len(comments)
+    author.delete()
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_recount_comments_command(news, comments):
+    """Команда recount_comments восстанавливает счётчик."""
+    News.objects.update(comment_count=0)
+    call_command('recount_comments', batch_size=1, stdout=StringIO())
+    news.refresh_from_db()
+    assert news.comment_count == len(comments)
+
+
+@pytest.mark.parametrize(
+    'method, url, data, expected_queries',
+    (
+        # Сессия, пользователь, новость, SAVEPOINT, счётчик, INSERT, RELEASE.
+        ('post', DETAIL_URL, FORM_DATA, 7),
+        # Сессия, пользователь, комментарий вместе с новостью.
+        ('get', EDIT_URL, None, 3),
+        # Сессия, пользователь, комментарий, UPDATE.
+        ('post', EDIT_URL, FORM_DATA, 4),
+        ('get', DELETE_URL, None, 3),
+        # Сессия, пользователь, комментарий, DELETE, счётчик из сигнала.
+        ('post', DELETE_URL, None, 5),
+    ),
+)
+def test_comment_write_paths_query_count(author_client, comment,
+                                         method, url, data,
+                                         expected_queries,
+                                         django_assert_num_queries):
+    """Создание, редактирование и удаление комментария
+    не делают лишних запросов к базе.
+    """
+    with django_assert_num_queries(expected_queries):
+        getattr(author_client, method)(url, data=data)
+
+
+@pytest.mark.parametrize('url', (EDIT_URL, DELETE_URL))
+def test_comment_writes_skip_news_join(author_client, comment, form_data,
+                                       url):
+    """При записи комментария новость не подгружается JOIN-ом."""
+    with CaptureQueriesContext(connection) as context:
+        author_client.post(url, data=form_data)
+    assert not [
+        query['sql'] for query in context.captured_queries
+        if 'JOIN' in query['sql']
+    ]
+
+
+def test_word_matcher_finds_all_words():
+    """Автомат находит все слова, в том числе вложенные друг в друга."""
+    matcher = WordMatcher(('he', 'she', 'his', 'hers', 'редиска'))
+    assert matcher.find('USHERS и Редиска') == {'she', 'he', 'hers',
+                                                'редиска'}
+    assert matcher.find('ничего такого') == set()
+
+
+def test_bad_words_form_reports_words():
+    """Форма сообщает, какие запрещённые слова найдены."""
+    form = CommentForm(data={'text': f'Ты {BAD_WORDS[1].upper()}!'})
+    assert not form.is_valid()
+    assert form.bad_words == {BAD_WORDS[1]}
+
+
+def test_bad_words_file_reloaded(settings, tmp_path):
+    """Слова из BAD_WORDS_FILE подхватываются после изменения файла."""
+    words_file = tmp_path / 'words.txt'
+    words_file.write_text('# словарь\nбука\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = str(words_file)
+    assert not CommentForm(data={'text': 'Бука и бяка'}).is_valid()
+    assert CommentForm(data={'text': 'Просто бяка'}).is_valid()
+    words_file.write_text('бука\nбяка\n', encoding='utf-8')
+    os.utime(words_file, ns=(0, 10 ** 9))
+    assert not CommentForm(data={'text': 'Просто бяка'}).is_valid()
+
+
+def test_bad_words_file_missing(settings, tmp_path):
+    """Без файла слов проверка идёт по встроенному словарю."""
+    settings.BAD_WORDS_FILE = str(tmp_path / 'missing.txt')
+    assert CommentForm(data={'text': 'Просто текст'}).is_valid()
+    assert not CommentForm(
+        data={'text': f'Текст, {BAD_WORDS[0]}'}
+    ).is_valid()
+
+
+@pytest.mark.django_db
+def test_import_news_command(author, tmp_path):
+    """Команда import_news загружает новости с комментариями пачками."""
+    records = [
+        {
+            'title': f'Новость {index}',
+            'text': 'Текст',
+            'date': '2022-10-01',
+            'comments': [
+                {'author': author.username, 'text': 'Первый'},
+                {'author': 'незнакомец', 'text': 'Пропущен'},
+            ],
+        } for index in range(5)
+    ]
+    data_file = tmp_path / 'news.jsonl'
+    data_file.write_text(
+        '\n'.join(json.dumps(record) for record in records),
+        encoding='utf-8'
+    )
+    out = StringIO()
+    call_command('import_news', str(data_file), batch_size=2, stdout=out)
+    assert News.objects.count() == len(records)
+    assert Comment.objects.filter(author=author).count() == len(records)
+    assert set(News.objects.values_list('comment_count', flat=True)) == {1}
+    assert 'пропущено комментариев: 5' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_news_command_csv(tmp_path):
+    """Команда import_news читает новости из CSV."""
+    data_file = tmp_path / 'news.csv'
+    data_file.write_text(
+        'title,text,date\nПервая,Текст,2022-10-01\nВторая,Текст,\n',
+        encoding='utf-8'
+    )
+    call_command('import_news', str(data_file), stdout=StringIO())
+    assert list(
+        News.objects.order_by('pk').values_list('title', flat=True)
+    ) == ['Первая', 'Вторая']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'line, error',
+    (
+        ('["Заголовок", "Текст"]', 'ожидается объект'),
+        ('{"title": "Заголовок"}', "нет обязательного поля 'text'"),
+        (
+            '{"title": "Заголовок", "text": "Текст", '
+            '"comments": [{"author": "Автор"}]}',
+            "комментарий 1: нет обязательного поля 'text'"
+        ),
+    )
+)
+def test_import_news_command_bad_record(author, tmp_path, line, error):
+    """Некорректная запись останавливает импорт с номером строки."""
+    data_file = tmp_path / 'news.jsonl'
+    data_file.write_text(
+        '{"title": "Заголовок", "text": "Текст"}\n\n' + line,
+        encoding='utf-8'
+    )
+    with pytest.raises(CommandError, match=f'Строка 3: {error}'):
+        call_command('import_news', str(data_file), stdout=StringIO())
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'line, error',
+    (
+        ('Без текста', "нет обязательного поля 'text'"),
+        ('Заголовок,Текст,2022-13-45', "некорректная дата '2022-13-45'"),
+    )
+)
+def test_import_news_command_bad_csv_row(tmp_path, line, error):
+    """Неполная строка CSV и неверная дата останавливают импорт
+    с номером строки до записи первой пачки.
+    """
+    data_file = tmp_path / 'news.csv'
+    data_file.write_text(
+        f'title,text,date\nПервая,Текст,2022-10-01\n{line}\n',
+        encoding='utf-8'
+    )
+    with pytest.raises(CommandError, match=f'Строка 3: {error}'):
+        call_command('import_news', str(data_file), stdout=StringIO())
+    assert not News.objects.exists()
+
+
+@pytest.mark.django_db
+def test_export_news_command(comments, tmp_path):
+    """Команда export_news выгружает комментарии в сжатый JSONL."""
+    output = tmp_path / 'comments.jsonl.gz'
+    call_command(
+        'export_news', 'comments', gzip=True, output=str(output),
+        chunk_size=1
+    )
+    with gzip.open(output, 'rt', encoding='utf-8') as file:
+        rows = [json.loads(line) for line in file]
+    assert [row['text'] for row in rows] == [
+        comment.text for comment in comments
+    ]
+    assert rows[0]['author__username'] == comments[0].author.username
+
+
+def metric_values(text):
+    return dict(
+        line.rsplit(' ', 1) for line in text.splitlines()
+        if not line.startswith('#')
+    )
+
+
+@pytest.mark.django_db
+def test_metrics_count_requests_by_url_name(client):
+    """/metrics считает запросы и время ответа по имени URL."""
+    labels = 'url_name="news:home",method="GET",status="200"'
+    counter = f'http_requests_total{{{labels}}}'
+    before = metric_values(client.get(METRICS_URL).content.decode())
+    client.get(HOME_URL)
+    client.get(HOME_URL)
+    response = client.get(METRICS_URL)
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    values = metric_values(response.content.decode())
+    assert float(values[counter]) - float(before.get(counter, 0)) == 2
+    buckets = [
+        name for name in values
+        if name.startswith(f'http_request_duration_seconds_bucket{{{labels}')
+    ]
+    assert len(buckets) == 12
+    assert buckets[-1].endswith('le="+Inf"}')
+    assert values[buckets[-1]] == values[
+        f'http_request_duration_seconds_count{{{labels}}}'
+    ]
+
+
+def record_in_child(counter, histogram):
+    for index in range(2000):
+        counter.inc((('worker', str(index)),))
+    histogram.observe((), 0.2)
+
+
+def test_metrics_aggregate_worker_processes(tmp_path):
+    """Процессы после fork пишут свои файлы, а вывод их суммирует."""
+    registry = Registry(tmp_path)
+    counter = Counter(registry, 'jobs_total', 'Задачи.')
+    histogram = Histogram(registry, 'job_seconds', 'Время задачи.')
+    counter.inc((('worker', '0'),))
+    histogram.observe((), 0.02)
+    child = multiprocessing.get_context('fork').Process(
+        target=record_in_child, args=(counter, histogram)
+    )
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert len(list(tmp_path.glob('metrics_*.db'))) == 2
+    values = metric_values(
+        render(registry, {'jobs_total': counter, 'job_seconds': histogram})
+    )
+    assert values['jobs_total{worker="0"}'] == '2.0'
+    assert values['jobs_total{worker="1999"}'] == '1.0'
+    assert values['job_seconds_bucket{le="0.025"}'] == '1.0'
+    assert values['job_seconds_bucket{le="0.25"}'] == '2.0'
+    assert values['job_seconds_count'] == '2.0'
+
+
+@pytest.fixture
+def profile_dir(settings, tmp_path):
+    settings.NEWS_PROFILE_DIR = tmp_path
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_staff_request_profiled(admin_client, news_detail_url, profile_dir):
+    """Запрос сотрудника с profile сохраняет профиль, видный в списке."""
+    response = admin_client.get(news_detail_url, {'profile': '1'})
+    name = response['X-Profile']
+    assert name.startswith('news.detail__') and name.endswith('.prof')
+    stats = pstats.Stats(str(profile_dir / name))
+    assert stats.total_calls > 0
+    response = admin_client.get(PROFILES_URL)
+    assert [profile['url_name'] for profile in response.context['profiles']]
+    assert response.context['profiles'][0]['name'] == name
+    profile_url = reverse('news:profile', args=(name,))
+    assert f'href="{profile_url}"' in response.content.decode()
+    response = admin_client.get(profile_url)
+    assert response['Content-Disposition'].startswith('attachment')
+    assert b''.join(response.streaming_content) == (
+        (profile_dir / name).read_bytes()
+    )
+
+
+@pytest.mark.django_db
+def test_sampling_profile_is_folded(admin_client, news_detail_url, settings,
+                                    profile_dir):
+    """profile=sample сохраняет стеки в формате flamegraph.pl."""
+    settings.NEWS_PROFILE_SAMPLE_INTERVAL = 0.0001
+    response = admin_client.get(news_detail_url, {'profile': 'sample'})
+    name = response['X-Profile']
+    assert name.endswith('.folded')
+    for line in (profile_dir / name).read_text().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        assert ';' in stack
+
+
+@pytest.mark.django_db
+def test_profile_needs_staff_or_token(author_client, news_detail_url,
+                                      profile_dir):
+    """Остальным пользователям нужна подпись пути в profile_token."""
+    assert not author_client.get(
+        news_detail_url, {'profile': '1'}
+    ).has_header('X-Profile')
+    assert not author_client.get(news_detail_url, {
+        'profile': '1', 'profile_token': make_profile_token(HOME_URL)
+    }).has_header('X-Profile')
+    assert author_client.get(news_detail_url, {
+        'profile': '1', 'profile_token': make_profile_token(news_detail_url)
+    }).has_header('X-Profile')
+    assert author_client.get(PROFILES_URL).status_code == (
+        HTTPStatus.FORBIDDEN
+    )
+
+
+@pytest.mark.django_db
+def test_old_profiles_pruned(admin_client, settings, profile_dir):
+    settings.NEWS_PROFILE_KEEP = 2
+    names = [
+        admin_client.get(HOME_URL, {'profile': '1'})['X-Profile']
+        for _ in range(3)
+    ]
+    assert sorted(path.name for path in profile_dir.iterdir()) == (
+        sorted(names[1:])
+    )
+
+
+@pytest.mark.parametrize('path, copy', SHARED_FILES)
+def test_shared_files_not_diverged(path, copy, settings):
+    """Общие с ya_note модули и шаблон совпадают с их копиями."""
+    root = settings.BASE_DIR.parent
+    if not (root / copy).is_file():
+        pytest.skip('Рядом нет проекта ya_note.')
+    assert (root / path).read_bytes() == (root / copy).read_bytes()
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+import pytest
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from news.models import Comment, News
+
+AUTHOR_CLIENT = pytest.lazy_fixture('author_client')
+ADMIN_CLIENT = pytest.lazy_fixture('admin_client')
+CLIENT = pytest.lazy_fixture('anonymous_client')
+# Объём данных: новостей на главной и комментариев к каждой.
+VOLUMES = (1, settings.NEWS_COUNT_ON_HOME_PAGE)
+
+
+@pytest.fixture(params=VOLUMES, ids=lambda volume: f'volume={volume}')
+def volume_news(request, author, django_user_model):
+    """Новости с комментариями разных авторов; возвращает самую свежую."""
+    volume = request.param
+    today = timezone.now().date()
+    News.objects.bulk_create(
+        News(title=f'Новость {index}', text='Текст',
+             date=today - timedelta(days=index))
+        for index in range(volume)
+    )
+    django_user_model.objects.bulk_create(
+        django_user_model(username=f'Читатель {index}')
+        for index in range(volume)
+    )
+    commenters = django_user_model.objects.filter(
+        username__startswith='Читатель'
+    )
+    Comment.objects.bulk_create(
+        Comment(news=item, author=commenter, text='Комментарий')
+        for item in News.objects.all() for commenter in commenters
+    )
+    news = News.objects.order_by('-date').first()
+    Comment.objects.create(news=news, author=author, text='Свой')
+    News.objects.refresh_comment_count()
+    return news
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name, args, user, budget',
+    (
+        ('news:home', None, CLIENT, 1),
+        ('news:home', None, AUTHOR_CLIENT, 3),
+        ('news:detail', 'news', CLIENT, 3),
+        ('news:detail', 'news', AUTHOR_CLIENT, 5),
+        ('news:comments', 'news', CLIENT, 1),
+        ('news:edit', 'comment', AUTHOR_CLIENT, 3),
+        ('news:delete', 'comment', AUTHOR_CLIENT, 3),
+        ('news:export', 'table', ADMIN_CLIENT, 3),
+        ('users:login', None, CLIENT, 0),
+        ('users:signup', None, CLIENT, 0),
+        ('users:logout', None, AUTHOR_CLIENT, 4),
+    ),
+)
+def test_query_budget(name, args, user, budget, volume_news, author,
+                      query_budget):
+    """Число запросов страницы не растёт вместе с объёмом данных."""
+    url_args = {
+        None: None,
+        'news': (volume_news.pk,),
+        'comment': (volume_news.comment_set.get(author=author).pk,),
+        'table': ('news',),
+    }[args]
+    url = reverse(name, args=url_args)
+    with query_budget(budget):
+        response = user.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
@@ -0,0 +1,59 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from news.pagination import encode_cursor
+
+AUTHOR_CLIENT = pytest.lazy_fixture('author_client')
+CLIENT = pytest.lazy_fixture('anonymous_client')
+HOME_URL = reverse('news:home')
+DETAIL_URL = pytest.lazy_fixture('news_detail_url')
+COMMENTS_URL = pytest.lazy_fixture('news_comments_url')
+EDIT_URL = pytest.lazy_fixture('news_edit_url')
+DELETE_URL = pytest.lazy_fixture('news_delete_url')
+
+
+def explain(sql):
+    """План выполнения запроса в SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_bad_step(step):
+    """Полный просмотр таблицы или сортировка во временном B-дереве."""
+    full_scan = step.startswith('SCAN ') and ' USING ' not in step
+    return full_scan or 'USE TEMP B-TREE' in step
+
+
+@pytest.fixture
+def news_comments_url(news, comments):
+    return reverse('news:comments', args=(news.id,)) + (
+        f'?after={encode_cursor(comments[0])}'
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url, user',
+    (
+        (HOME_URL, CLIENT),
+        (HOME_URL, AUTHOR_CLIENT),
+        (DETAIL_URL, CLIENT),
+        (DETAIL_URL, AUTHOR_CLIENT),
+        (COMMENTS_URL, CLIENT),
+        (EDIT_URL, AUTHOR_CLIENT),
+        (DELETE_URL, AUTHOR_CLIENT),
+    ),
+)
+def test_queries_use_indexes(url, user, comment):
+    """Запросы страниц не просматривают таблицы целиком
+    и не сортируют результат во временном B-дереве.
+    """
+    with CaptureQueriesContext(connection) as context:
+        user.get(url)
+    assert context.captured_queries
+    for query in context.captured_queries:
+        plan = explain(query['sql'])
+        assert not any(map(is_bad_step, plan)), (query['sql'], plan)
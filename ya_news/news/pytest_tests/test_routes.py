@@ -1,9 +1,19 @@
+from datetime import timedelta
 from http import HTTPStatus
 
 import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from pytest_django.asserts import assertRedirects
 
+from news.cache import HOME_CHANGED_KEY
+from news.models import Comment
+
 HOME_URL = reverse('news:home')
 LOGIN_URL = reverse('users:login')
 LOGOUT_URL = reverse('users:logout')
@@ -59,3 +69,142 @@ def test_pages_availability_for_author(
 ):
     response = parametrized_client.get(url)
     assert response.status_code == expected_status
+
+
+def settle_changes():
+    """Сдвигает время последней записи на секунду назад."""
+    cache.set(HOME_CHANGED_KEY, timezone.now() - timedelta(seconds=1), None)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (HOME_URL, DETAIL_URL))
+def test_conditional_get_not_modified(client, url):
+    """Повторный запрос с If-None-Match или If-Modified-Since
+    получает 304 без рендеринга шаблона.
+    """
+    settle_changes()
+    response = client.get(url)
+    for header, value in (
+        ('HTTP_IF_NONE_MATCH', response['ETag']),
+        ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified']),
+    ):
+        response = client.get(url, **{header: value})
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.context is None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (HOME_URL, DETAIL_URL))
+def test_conditional_get_after_new_comment(client, news, author, url):
+    """После нового комментария страница отдаётся заново."""
+    etag = client.get(url)['ETag']
+    Comment.objects.create(news=news, author=author, text='Текст')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == OK_200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (HOME_URL, DETAIL_URL))
+def test_no_last_modified_in_second_of_change(client, news, url):
+    """В секунду последней записи Last-Modified не отдаётся:
+    следующая запись в ту же секунду его бы не изменила.
+    """
+    response = client.get(url)
+    assert response.has_header('ETag')
+    assert not response.has_header('Last-Modified')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('change', ('edit', 'delete'))
+def test_conditional_get_after_comment_change(
+        client, news, author, news_detail_url, change
+):
+    """Правка комментария и удаление последнего из них
+    не оставляют старый Last-Modified в силе.
+    """
+    Comment.objects.create(news=news, author=author, text='Первый')
+    newest = Comment.objects.create(news=news, author=author, text='Второй')
+    settle_changes()
+    last_modified = client.get(news_detail_url)['Last-Modified']
+    if change == 'edit':
+        newest.text = 'Исправленный'
+        newest.save()
+    else:
+        newest.delete()
+    response = client.get(
+        news_detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+    )
+    assert response.status_code == OK_200
+
+
+@pytest.mark.parametrize('url', (HOME_URL, DETAIL_URL))
+def test_conditional_get_depends_on_user(author_client, url):
+    """ETag анонима не подходит авторизованному пользователю."""
+    etag = Client().get(url)['ETag']
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == OK_200
+
+
+@pytest.mark.django_db
+def test_conditional_get_depends_on_csrf_token(author_client, news_detail_url):
+    """После смены CSRF-токена, например при новом входе,
+    страница с формой комментария отдаётся заново.
+    """
+    etag = author_client.get(news_detail_url)['ETag']
+    author_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+    response = author_client.get(news_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == OK_200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'parametrized_client, expected_status',
+    (
+        (AUTHOR_CLIENT, HTTPStatus.FORBIDDEN),
+        (ADMIN_CLIENT, OK_200),
+    ),
+)
+def test_export_only_for_staff(parametrized_client, expected_status, news):
+    """Выгрузка новостей доступна только персоналу."""
+    url = reverse('news:export', args=('news',))
+    response = parametrized_client.get(url, {'format': 'csv'})
+    assert response.status_code == expected_status
+    if expected_status == OK_200:
+        content = b''.join(response.streaming_content).decode()
+        assert content.splitlines()[1].startswith(f'{news.id},{news.title}')
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@pytest.mark.django_db
+def test_server_timing_header(client, settings, news_detail_url, comment):
+    """Server-Timing делит общее время на SQL, шаблоны и Python."""
+    settings.NEWS_SERVER_TIMING = True
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(news_detail_url)
+    metrics = parse_server_timing(response['Server-Timing'])
+    assert set(metrics) == {'db', 'tpl', 'app', 'total'}
+    assert metrics['db']['desc'] == (
+        f'"{len(context.captured_queries)} queries"'
+    )
+    durations = {name: float(metric['dur'])
+                 for name, metric in metrics.items()}
+    assert durations['tpl'] > 0
+    assert durations['db'] + durations['tpl'] + durations['app'] == (
+        pytest.approx(durations['total'], abs=0.05)
+    )
+
+
+@pytest.mark.django_db
+def test_server_timing_disabled(client, settings):
+    settings.NEWS_SERVER_TIMING = False
+    response = client.get(HOME_URL)
+    assert response.status_code == OK_200
+    assert not response.has_header('Server-Timing')
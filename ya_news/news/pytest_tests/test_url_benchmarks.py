@@ -0,0 +1,179 @@
+"""Задержка и число SQL-запросов всех именованных URL.
+
+Не входят в обычный прогон тестов, запускаются так:
+BENCHMARK=1 pytest -s news/pytest_tests/test_url_benchmarks.py
+С BENCHMARK_UPDATE=1 результаты записываются в url_benchmarks.json
+как новая базовая линия. Без него прогон падает, если медиана (p50)
+какого-либо URL выросла больше чем на долю BENCHMARK_THRESHOLD
+(по умолчанию 0.5) или запросов к базе стало больше, чем в базовой
+линии. p95 только выводится: на десятках замеров это почти максимум,
+и одна пауза сборщика мусора роняла бы прогон.
+Каждый запрос делается с пустым кешем, то есть замеряется худший случай.
+"""
+import json
+import os
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from news.models import Comment, News
+from news.urls import app_name, urlpatterns
+from yanews.urls import auth_urls
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('BENCHMARK'), reason='Нужна переменная BENCHMARK.'
+)
+
+BASELINE_FILE = Path(__file__).with_name('url_benchmarks.json')
+REPEAT = int(os.environ.get('BENCHMARK_REPEAT', 50))
+THRESHOLD = float(os.environ.get('BENCHMARK_THRESHOLD', 0.5))
+# Абсолютный допуск, чтобы шум не ронял быстрые страницы.
+NOISE_MS = 5.0
+NEWS_COUNT = 1000
+COMMENTS_COUNT = 200
+
+
+def named_urls():
+    """Имена всех URL приложения news и страниц пользователей."""
+    patterns, users_namespace = auth_urls
+    return {
+        f'{app_name}:{pattern.name}' for pattern in urlpatterns
+    } | {
+        f'{users_namespace}:{pattern.name}' for pattern in patterns
+    }
+
+
+def percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+def fetch(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, url, login=None):
+    """p50, p95 в миллисекундах и число запросов для URL.
+
+    login — пользователь, которого нужно заново логинить перед
+    каждым запросом (для выхода из учётной записи).
+    """
+    timings = []
+    for _ in range(REPEAT):
+        cache.clear()
+        if login:
+            client.force_login(login)
+        started = time.perf_counter()
+        fetch(client, url)
+        timings.append((time.perf_counter() - started) * 1000)
+    cache.clear()
+    if login:
+        client.force_login(login)
+    with CaptureQueriesContext(connection) as context:
+        fetch(client, url)
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': len(context.captured_queries),
+    }
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {result["queries"]}'
+            )
+        limit = base['p50_ms'] * (1 + THRESHOLD) + NOISE_MS
+        if result['p50_ms'] > limit:
+            regressions.append(
+                f'{name}: p50 {base["p50_ms"]} -> {result["p50_ms"]} мс'
+            )
+    return regressions
+
+
+@pytest.fixture
+def seeded_news(author):
+    """Новости за несколько лет и одна новость с длинным обсуждением."""
+    today = timezone.now().date()
+    News.objects.bulk_create(
+        News(
+            title=f'Новость {index}',
+            text='Текст новости. ' * 50,
+            date=today - timedelta(days=index)
+        ) for index in range(NEWS_COUNT)
+    )
+    news = News.objects.order_by('-date').first()
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Комментарий {index}')
+        for index in range(COMMENTS_COUNT)
+    )
+    News.objects.refresh_comment_count()
+    return news
+
+
+def test_url_benchmarks(seeded_news, author, django_user_model, settings,
+                        tmp_path):
+    """Все URL укладываются в базовую линию по задержке и запросам."""
+    settings.NEWS_PROFILE_DIR = tmp_path
+    comment = seeded_news.comment_set.first()
+    staff = django_user_model.objects.create(username='Админ', is_staff=True)
+    clients = {
+        'anonymous': Client(), 'author': Client(), 'staff': Client(),
+        'logout': Client(),
+    }
+    clients['author'].force_login(author)
+    clients['staff'].force_login(staff)
+    profile = clients['staff'].get(
+        reverse('news:detail', args=(seeded_news.pk,)), {'profile': '1'}
+    )['X-Profile']
+    specs = {
+        'news:home': {},
+        'news:detail': {'args': (seeded_news.pk,)},
+        'news:comments': {'args': (seeded_news.pk,)},
+        'news:delete': {'args': (comment.pk,)},
+        'news:edit': {'args': (comment.pk,)},
+        'news:export': {'args': ('news',), 'client': 'staff'},
+        'news:profiles': {'client': 'staff'},
+        'news:profile': {'args': (profile,), 'client': 'staff'},
+        'users:login': {'client': 'anonymous'},
+        'users:logout': {'client': 'logout', 'login': author},
+        'users:signup': {'client': 'anonymous'},
+    }
+    assert set(specs) == named_urls(), (
+        'Добавьте в замер новые URL: '
+        f'{sorted(named_urls() - set(specs))}'
+    )
+    results = {}
+    for name, spec in specs.items():
+        client = clients[spec.get('client', 'author')]
+        url = reverse(name, args=spec.get('args'))
+        results[name] = measure(client, url, spec.get('login'))
+        print(f'\n{name}: {results[name]}', end='')
+    if os.environ.get('BENCHMARK_UPDATE'):
+        BASELINE_FILE.write_text(
+            json.dumps(results, ensure_ascii=False, indent=2) + '\n'
+        )
+        return
+    baseline = {}
+    if BASELINE_FILE.exists():
+        baseline = json.loads(BASELINE_FILE.read_text())
+    regressions = find_regressions(results, baseline)
+    assert not regressions, '\n'.join(regressions)
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_home_version
+from .models import Comment, News
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_comment_count(sender, instance, **kwargs):
+    """Сигнал срабатывает и при каскадном и массовом удалении,
+    которые обходят Comment.delete.
+    """
+    instance._change_comment_count(-1)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_home_page(sender, **kwargs):
+    """Любое изменение новостей или комментариев сбрасывает кеш главной."""
+    bump_home_version()
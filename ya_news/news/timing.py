@@ -0,0 +1,103 @@
+"""Заголовок Server-Timing с разбивкой времени ответа.
+
+Время запроса делится на непересекающиеся части: SQL-запросы (db),
+рендеринг шаблонов без запросов из них (tpl) и остальной Python (app).
+Запросы считаются обёрткой execute_wrapper всех подключений, шаблоны —
+обёрткой Template._render: сигнал template_rendered отправляется только
+в тестовом окружении. Вложенные шаблоны учитываются один раз, в
+самом внешнем. Выключенный настройкой <префикс>_SERVER_TIMING middleware
+убирается из цепочки, и Template._render остаётся прежним.
+
+Модуль одинаков в ya_news и ya_note: настройки читаются с префиксом
+SETTINGS_PREFIX из apps.py приложения (NEWS или NOTES).
+"""
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+from .apps import SETTINGS_PREFIX
+
+current_timer = ContextVar('server_timing', default=None)
+
+
+class Timer:
+    """Накопленное за запрос время SQL и шаблонов."""
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.rendering = False
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def header(self, total):
+        app = total - self.db - self.template
+        return ', '.join((
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template * 1000:.2f};desc="Templates"',
+            f'app;dur={app * 1000:.2f};desc="Python"',
+            f'total;dur={total * 1000:.2f}',
+        ))
+
+
+def timed_render(render):
+    """Template._render, добавляющий своё время к таймеру запроса."""
+
+    def _render(self, context):
+        timer = current_timer.get()
+        if timer is None or timer.rendering:
+            return render(self, context)
+        timer.rendering = True
+        db_before = timer.db
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timer.rendering = False
+            timer.template += (
+                time.perf_counter() - started - (timer.db - db_before)
+            )
+
+    _render.timed = True
+    return _render
+
+
+class ServerTimingMiddleware:
+    """Добавляет к ответу заголовок Server-Timing."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, f'{SETTINGS_PREFIX}_SERVER_TIMING'):
+            raise MiddlewareNotUsed
+        if not getattr(Template._render, 'timed', False):
+            Template._render = timed_render(Template._render)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = Timer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timer.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        response['Server-Timing'] = timer.header(
+            time.perf_counter() - started
+        )
+        return response
@@ -7,10 +7,22 @@ app_name = 'news'
 urlpatterns = [
     path('', views.NewsList.as_view(), name='home'),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path(
+        'news/<int:pk>/comments/',
+        views.NewsComments.as_view(),
+        name='comments'
+    ),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
         name='delete'
     ),
     path('edit_comment/<int:pk>/', views.CommentUpdate.as_view(), name='edit'),
+    path('export/<str:table>/', views.NewsExport.as_view(), name='export'),
+    path('profiles/', views.ProfileList.as_view(), name='profiles'),
+    path(
+        'profiles/<str:name>/',
+        views.ProfileDownload.as_view(),
+        name='profile'
+    ),
 ]
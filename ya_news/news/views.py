@@ -1,49 +1,130 @@
+from pathlib import Path
+
 from django.conf import settings
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.db.models import Q
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse
+)
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .cache import get_home_page, get_home_version, set_home_page
+from .conditions import (
+    detail_etag, detail_last_modified, home_etag, home_last_modified
+)
+from .export import FORMATS, TABLES, export, export_filename
 from .forms import CommentForm
+from .metrics import CONTENT_TYPE, render_metrics
+from .profiling import PROFILE_NAME, list_profiles
 from .models import Comment, News
+from .pagination import decode_cursor, encode_cursor
 
 
 class NewsList(generic.ListView):
-    """Список новостей."""
+    """Список новостей.
+
+    Страница кешируется до ближайшего изменения новостей или комментариев:
+    анонимам отдаётся готовый HTML, а авторизованным пользователям
+    перерисовывается только шапка вокруг закешированного списка.
+    """
     model = News
     template_name = 'news/home.html'
 
+    @method_decorator(condition(home_etag, home_last_modified))
+    def get(self, request, *args, **kwargs):
+        self.cache_version = get_home_version()
+        anonymous = not request.user.is_authenticated
+        if anonymous:
+            content = get_home_page(self.cache_version)
+            if content is not None:
+                return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        if anonymous:
+            response.add_post_render_callback(
+                lambda response: set_home_page(
+                    self.cache_version, response.content
+                )
+            )
+        return response
+
     def get_queryset(self):
         """
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_version'] = self.cache_version
+        context['cache_timeout'] = settings.NEWS_HOME_CACHE_TIMEOUT
+        return context
 
 
-class NewsDetail(generic.DetailView):
+class CommentPageMixin:
+    """Выдача комментариев новости страницами по курсору (created, id).
+
+    Курсор передаётся в параметре ``after``; каждая страница — один запрос
+    с LIMIT, независимо от общего числа комментариев.
+    """
+
+    def get_comment_page(self, news_id):
+        per_page = settings.COMMENTS_COUNT_ON_DETAIL_PAGE
+        comments = Comment.objects.filter(
+            news_id=news_id
+        ).select_related('author').order_by('created', 'pk')
+        cursor = self.request.GET.get('after')
+        if cursor:
+            try:
+                created, pk = decode_cursor(cursor)
+            except ValueError:
+                raise Http404('Некорректный курсор комментариев.')
+            comments = comments.filter(
+                Q(created__gt=created) | Q(created=created, pk__gt=pk)
+            )
+        page = list(comments[:per_page + 1])
+        next_cursor = None
+        if len(page) > per_page:
+            page = page[:per_page]
+            next_cursor = encode_cursor(page[-1])
+        return {'comments': page, 'next_cursor': next_cursor}
+
+
+class NewsDetail(CommentPageMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
-    def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(self.get_comment_page(self.object.pk))
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
         return context
 
 
+class NewsComments(CommentPageMixin, generic.TemplateView):
+    """Фрагмент со следующей страницей комментариев новости."""
+    template_name = 'news/includes/comments.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['news_pk'] = self.kwargs['pk']
+        context.update(self.get_comment_page(self.kwargs['pk']))
+        # Непустая страница уже доказывает, что новость есть.
+        if not context['comments'] and not News.objects.filter(
+                pk=self.kwargs['pk']
+        ).exists():
+            raise Http404('Новость не найдена.')
+        return context
+
+
 class NewsComment(
         LoginRequiredMixin,
+        CommentPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -55,6 +136,11 @@ class NewsComment(
         self.object = self.get_object()
         return super().post(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_comment_page(self.object.pk))
+        return context
+
     def form_valid(self, form):
         comment = form.save(commit=False)
         comment.news = self.object
@@ -63,19 +149,22 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
+    """Просмотр новости и отправка комментария по одному адресу."""
+    detail_view = staticmethod(NewsDetail.as_view())
+    comment_view = staticmethod(NewsComment.as_view())
 
+    @method_decorator(condition(detail_etag, detail_last_modified))
     def get(self, request, *args, **kwargs):
-        view = NewsDetail.as_view()
-        return view(request, *args, **kwargs)
+        return self.detail_view(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
-        view = NewsComment.as_view()
-        return view(request, *args, **kwargs)
+        return self.comment_view(request, *args, **kwargs)
 
 
 class CommentBase(LoginRequiredMixin):
@@ -83,14 +172,18 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        comments = self.model.objects.filter(author=self.request.user)
+        # Заголовок новости нужен только страницам подтверждения,
+        # при записи достаточно news_id.
+        if self.request.method == 'GET':
+            comments = comments.select_related('news')
+        return comments
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -102,3 +195,58 @@ class CommentUpdate(CommentBase, generic.UpdateView):
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+
+class StaffMixin(LoginRequiredMixin, UserPassesTestMixin):
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class NewsExport(StaffMixin, generic.View):
+    """Потоковая выгрузка новостей или комментариев для персонала."""
+
+    def get(self, request, table):
+        data_format = request.GET.get('format', 'jsonl')
+        if table not in TABLES or data_format not in FORMATS:
+            raise Http404('Неизвестная таблица или формат выгрузки.')
+        compress = 'gzip' in request.GET
+        response = StreamingHttpResponse(
+            export(table, data_format, compress),
+            content_type=(
+                'application/gzip' if compress
+                else f'text/{data_format}; charset=utf-8'
+            )
+        )
+        filename = export_filename(table, data_format, compress)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ProfileList(StaffMixin, generic.TemplateView):
+    """Последние сохранённые профили запросов."""
+    template_name = 'news/profiles.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = list_profiles(
+            Path(settings.NEWS_PROFILE_DIR), settings.NEWS_PROFILE_KEEP
+        )
+        return context
+
+
+class ProfileDownload(StaffMixin, generic.View):
+    """Файл профиля для pstats, snakeviz или flamegraph.pl."""
+
+    def get(self, request, name):
+        path = Path(settings.NEWS_PROFILE_DIR) / name
+        if not PROFILE_NAME.match(name) or not path.is_file():
+            raise Http404('Профиль не найден.')
+        return FileResponse(path.open('rb'), as_attachment=True)
+
+
+class Metrics(generic.View):
+    """Метрики запросов всех процессов в формате Prometheus."""
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
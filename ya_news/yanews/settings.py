@@ -21,11 +21,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'news.metrics.MetricsMiddleware',
+    'news.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'news.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,3 +83,34 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+
+# Заголовок Server-Timing с временем SQL, шаблонов и Python.
+# Выключенный не добавляет накладных расходов.
+NEWS_SERVER_TIMING = DEBUG
+
+# Каталог файлов метрик для /metrics при нескольких процессах-воркерах,
+# общий для всех воркеров и очищаемый при перезапуске. Без него каждый
+# процесс отдаёт только свои метрики.
+NEWS_METRICS_DIR = None
+
+# Профили запросов с параметром profile, см. news/profiling.py.
+NEWS_PROFILE_DIR = BASE_DIR / 'profiles'
+NEWS_PROFILE_KEEP = 100
+NEWS_PROFILE_SAMPLE_INTERVAL = 0.005
+NEWS_PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Для нескольких процессов-воркеров locmem стоит заменить на
+# django.core.cache.backends.filebased.FileBasedCache, иначе версия кеша
+# главной страницы будет своей в каждом процессе.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+NEWS_HOME_CACHE_TIMEOUT = None
+
+# Необязательный файл с дополнительными запрещёнными словами,
+# по одному в строке. Изменения подхватываются без перезапуска.
+BAD_WORDS_FILE = None
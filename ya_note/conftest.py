@@ -0,0 +1,8 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кеш не переживает откат базы между тестами, очищаем его сами."""
+    cache.clear()
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
 
+# Префикс настроек приложения. Через него читают настройки модули,
+# общие для ya_news и ya_note: metrics, profiling и timing.
+SETTINGS_PREFIX = 'NOTES'
+
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,263 @@
+"""Пакетные операции над заметками для синхронизации клиентов.
+
+Каждая операция проверяется правилами NoteForm, но уникальность slug
+проверяется сразу для всего пакета, а запись идёт массовыми запросами
+в одной транзакции. Массовые запросы не отправляют сигналы и не
+удаляют каскадом, поэтому связи с тегами, записи об удалении, HTML
+текста, номера изменений, поисковый индекс и версия кеша автора
+обновляются здесь же.
+"""
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from .cache import bump_author_version
+from .forms import WARNING, NoteForm
+from .models import DeletedNote, Note, NoteTag, allocate_changes
+from .search import index_notes, unindex_notes
+from .slugs import slugify_many
+
+OPERATIONS = ('create', 'update', 'delete')
+# Запас до лимита SQLite на число параметров в одном запросе.
+MAX_QUERY_PARAMS = 500
+
+UNKNOWN_OPERATION = 'Операция должна быть одной из: create, update, delete.'
+NOT_FOUND = 'Заметка не найдена.'
+DUPLICATE = 'Заметка уже изменяется другой операцией пакета.'
+
+
+def chunks(values, size=MAX_QUERY_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class BatchNoteForm(NoteForm):
+    """NoteForm без запросов к базе: slug проверяет NoteBatch."""
+
+    def clean_slug(self):
+        return self.cleaned_data.get('slug')
+
+    def validate_unique(self):
+        pass
+
+
+class NoteBatch:
+    """Пакет операций create/update/delete над заметками автора.
+
+    Операция — словарь с ключом ``op``; update и delete указывают
+    ``id`` заметки, create и update передают поля NoteForm. При update
+    непереданные поля остаются прежними. Ошибочные операции
+    пропускаются, остальные применяются.
+    """
+
+    def __init__(self, author, operations):
+        self.author = author
+        self.operations = operations
+        self.results = [None] * len(operations)
+        self.forms = {}
+        self.deleted = {}
+        self.old_slugs = {}
+
+    def apply(self):
+        """Применяет пакет и возвращает результаты в порядке операций."""
+        notes = self.load_notes()
+        for index, operation in enumerate(self.operations):
+            self.validate(index, operation, notes)
+        self.check_slugs()
+        self.allocate_slugs()
+        with transaction.atomic():
+            self.save()
+        return self.results
+
+    def fail(self, index, errors):
+        self.results[index] = {'status': 'error', 'errors': errors}
+
+    def load_notes(self):
+        ids = {
+            operation.get('id') for operation in self.operations
+            if isinstance(operation, dict)
+            and operation.get('op') in ('update', 'delete')
+            and type(operation.get('id')) is int
+        }
+        notes = {}
+        for chunk in chunks(ids):
+            notes.update(
+                (note.pk, note) for note in
+                Note.objects.filter(author=self.author, pk__in=chunk)
+            )
+        return notes
+
+    def validate(self, index, operation, notes):
+        if not isinstance(operation, dict) or (
+                operation.get('op') not in OPERATIONS
+        ):
+            return self.fail(index, {'op': [UNKNOWN_OPERATION]})
+        if operation['op'] == 'create':
+            return self.validate_form(index, BatchNoteForm(data=operation))
+        note = notes.get(operation.get('id'))
+        if note is None:
+            return self.fail(index, {'id': [NOT_FOUND]})
+        if note.pk in self.old_slugs:
+            return self.fail(index, {'id': [DUPLICATE]})
+        self.old_slugs[note.pk] = note.slug
+        if operation['op'] == 'delete':
+            self.deleted[index] = note
+            return
+        # Непереданные поля берутся из заметки; переданный текст
+        # избавляет от распаковки прежнего.
+        data = model_to_dict(note, fields=[
+            field for field in NoteForm._meta.fields if field not in operation
+        ])
+        data.update(operation)
+        self.validate_form(index, BatchNoteForm(data=data, instance=note))
+
+    def validate_form(self, index, form):
+        if form.is_valid():
+            self.forms[index] = form
+        else:
+            self.fail(index, {
+                field: list(errors) for field, errors in form.errors.items()
+            })
+
+    def released_slugs(self):
+        """Прежние slug удаляемых и изменяемых заметок пакета."""
+        return {
+            self.old_slugs[form.instance.pk]
+            for form in self.forms.values() if form.instance.pk
+        } | {note.slug for note in self.deleted.values()}
+
+    def check_slugs(self):
+        """Явные slug не заняты другими заметками и не повторяются.
+
+        Из повторов внутри пакета slug получает первая операция.
+        Отклонённая операция оставляет заметке прежний slug, на который
+        могла рассчитывать другая, поэтому проверка повторяется, пока
+        отказы не прекратятся.
+        """
+        slugs = {
+            form.instance.slug for form in self.forms.values()
+            if form.instance.slug
+        }
+        taken = set()
+        for chunk in chunks(slugs):
+            taken.update(
+                Note.objects.filter(slug__in=chunk).values_list(
+                    'slug', flat=True
+                )
+            )
+        while self.reject_slugs(taken - self.released_slugs()):
+            pass
+
+    def reject_slugs(self, taken):
+        """Отклоняет операции с занятыми или повторными slug.
+
+        Возвращает, была ли отклонена хоть одна операция.
+        """
+        indexes = {}
+        for index, form in self.forms.items():
+            if form.instance.slug:
+                indexes.setdefault(form.instance.slug, []).append(index)
+        rejected = False
+        for slug, slug_indexes in indexes.items():
+            if slug not in taken:
+                slug_indexes = slug_indexes[1:]
+            for index in slug_indexes:
+                del self.forms[index]
+                self.fail(index, {'slug': [slug + WARNING]})
+                rejected = True
+        return rejected
+
+    def allocate_slugs(self):
+        """Подбирает slug заметкам без slug, как Note.save, но пачкой."""
+        notes = [
+            form.instance for form in self.forms.values()
+            if not form.instance.slug
+        ]
+        if not notes:
+            return
+        reserved = {
+            form.instance.slug for form in self.forms.values()
+            if form.instance.slug
+        }
+        slugs = Note.objects.allocate_slugs(
+            slugify_many(note.title for note in notes),
+            reserved=reserved,
+            released=self.released_slugs()
+        )
+        for note, slug in zip(notes, slugs):
+            note.slug = slug
+
+    def free_old_slugs(self, updated):
+        """Снимает прежние slug с переименуемых заметок.
+
+        UNIQUE в UPDATE проверяется построчно, поэтому цепочка
+        aa -> bb, bb -> cc зависит от порядка строк, а обмен slug
+        не проходит вовсе. Если новый slug одной заметки пакета
+        совпадает с прежним slug другой, переименуемые заметки сначала
+        получают временные slug, которых нет у NoteForm.
+        """
+        renamed = [
+            note for note in updated if note.slug != self.old_slugs[note.pk]
+        ]
+        old_slugs = {self.old_slugs[note.pk] for note in renamed}
+        if any(note.slug in old_slugs for note in renamed):
+            Note.objects.bulk_update(
+                [Note(pk=note.pk, slug=f'~{note.pk}') for note in renamed],
+                ('slug',)
+            )
+
+    def save(self):
+        deleted_ids = [note.pk for note in self.deleted.values()]
+        for chunk in chunks(deleted_ids):
+            # QuerySet.delete отправил бы post_delete на каждую заметку,
+            # то есть несколько запросов на строку. Связи с тегами
+            # удаляются заранее: сырое удаление не идёт каскадом.
+            NoteTag.objects.filter(note_id__in=chunk).delete()
+            notes = Note.objects.filter(pk__in=chunk)
+            notes._raw_delete(notes.db)
+        DeletedNote.objects.bulk_create(
+            DeletedNote(note_id=pk, author=self.author, change=change)
+            for pk, change in zip(
+                deleted_ids, allocate_changes(len(deleted_ids))
+            )
+        )
+        statuses = {
+            index: 'updated' if form.instance.pk else 'created'
+            for index, form in self.forms.items()
+        }
+        updated = [
+            self.forms[index].instance
+            for index, status in statuses.items() if status == 'updated'
+        ]
+        # bulk_update не заполняет auto_now, ставим время сами.
+        now = timezone.now()
+        for note, change in zip(updated, allocate_changes(len(updated))):
+            note.updated_at = now
+            note.change = change
+            note.render_html()
+        self.free_old_slugs(updated)
+        Note.objects.bulk_update(
+            updated, ('title', 'text', 'slug', 'updated_at', 'change',
+                      'html', 'html_hash')
+        )
+        created = [
+            self.forms[index].instance
+            for index, status in statuses.items() if status == 'created'
+        ]
+        for note in created:
+            note.author = self.author
+            note.render_html()
+        Note.objects.bulk_create_notes(created)
+        unindex_notes(deleted_ids)
+        index_notes(updated + created)
+        if deleted_ids or updated or created:
+            bump_author_version(self.author.pk)
+        for index, note in self.deleted.items():
+            self.results[index] = {'status': 'deleted', 'id': note.pk}
+        for index, form in self.forms.items():
+            self.results[index] = {
+                'status': statuses[index],
+                'id': form.instance.pk,
+                'slug': form.instance.slug,
+            }
@@ -0,0 +1,62 @@
+"""Кеш страниц заметок в пространстве имён автора.
+
+У каждого автора своя версия кеша, которая увеличивается при любом
+изменении его заметок. Ключи страниц включают id автора и путь запроса,
+а версия отсекает всё, что закешировано до изменения.
+"""
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+AUTHOR_VERSION_KEY = 'notes:author:{}:version'
+AUTHOR_PAGE_KEY = 'notes:author:{}:page:{}'
+
+
+def get_author_version(author_id):
+    """Текущая версия кеша автора.
+
+    Если ключ версии вытеснен из кеша, новая версия берётся из текущего
+    времени, чтобы не совпасть ни с одной из ранее выданных.
+    """
+    key = AUTHOR_VERSION_KEY.format(author_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def increment_version(author_id):
+    try:
+        cache.incr(AUTHOR_VERSION_KEY.format(author_id))
+    except ValueError:
+        get_author_version(author_id)
+
+
+def bump_author_version(author_id):
+    """Делает устаревшими все закешированные страницы автора.
+
+    Версия меняется сразу и ещё раз после фиксации транзакции: иначе
+    страница, собранная до фиксации по старым данным, осталась бы
+    в кеше под новой версией.
+    """
+    increment_version(author_id)
+    transaction.on_commit(lambda: increment_version(author_id))
+
+
+def page_key(author_id, path):
+    return AUTHOR_PAGE_KEY.format(author_id, md5(path.encode()).hexdigest())
+
+
+def get_author_page(author_id, path, version):
+    return cache.get(page_key(author_id, path), version=version)
+
+
+def set_author_page(author_id, path, version, content):
+    cache.set(
+        page_key(author_id, path), content,
+        settings.NOTES_PAGE_CACHE_TIMEOUT, version=version
+    )
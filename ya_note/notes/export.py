@@ -0,0 +1,70 @@
+"""Выгрузка заметок zip-архивом Markdown-файлов и разбор таких файлов.
+
+Архив пишется в псевдофайл и отдаётся кусками после каждой заметки,
+а заметки читаются из базы курсором пачками, так что в памяти
+держатся только текущая заметка и оглавление архива.
+"""
+import zipfile
+
+from django.utils import timezone
+
+from .models import Note
+
+CHUNK_SIZE = 500
+EXTENSION = '.md'
+TITLE_PREFIX = '# '
+
+
+class ZipStream:
+    """Псевдофайл без seek для ZipFile: копит записанное до выдачи."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def to_markdown(note):
+    return f'{TITLE_PREFIX}{note.title}\n\n{note.text}'
+
+
+def from_markdown(content):
+    """Заголовок и текст из Markdown-файла; заголовок может отсутствовать."""
+    if not content.startswith(TITLE_PREFIX):
+        return None, content
+    title, _, text = content[len(TITLE_PREFIX):].partition('\n')
+    if text.startswith('\n'):
+        text = text[1:]
+    return title.strip(), text
+
+
+def iter_zip(notes):
+    """Байтовые куски zip-архива с файлом ``<slug>.md`` на заметку."""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for note in notes:
+            info = zipfile.ZipInfo(
+                f'{note.slug}{EXTENSION}',
+                timezone.localtime(note.updated_at).timetuple()[:6]
+            )
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, to_markdown(note))
+            yield stream.pop()
+    yield stream.pop()
+
+
+def export_notes(author, chunk_size=CHUNK_SIZE):
+    notes = Note.objects.filter(author=author).only(
+        'slug', 'title', 'text', 'updated_at'
+    ).order_by('id').iterator(chunk_size=chunk_size)
+    return iter_zip(notes)
@@ -0,0 +1,78 @@
+"""Текстовое поле со сжатием больших значений.
+
+Тексты длиннее NOTES_TEXT_COMPRESS_THRESHOLD байт сохраняются в ту же
+колонку как zlib-поток: SQLite хранит его как BLOB рядом с обычными
+строками. Из базы значение приходит как есть и распаковывается только
+при первом обращении к атрибуту модели, так что запросы, которые текст
+не читают, ничего не распаковывают. Сжатый текст, прочитанный через
+values(), приводит к строке decompress_text.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text):
+    """zlib-поток для длинного текста, иначе сам текст."""
+    data = text.encode()
+    if len(data) < settings.NOTES_TEXT_COMPRESS_THRESHOLD:
+        return text
+    compressed = zlib.compress(data, COMPRESSION_LEVEL)
+    return compressed if len(compressed) < len(data) else text
+
+
+def decompress_text(value):
+    if isinstance(value, (bytes, memoryview)):
+        return zlib.decompress(value).decode()
+    return value
+
+
+def is_unpacked(instance, attname):
+    """Прочитан ли текст экземпляра: загружен и уже распакован."""
+    value = instance.__dict__.get(attname)
+    return value is not None and not isinstance(value, (bytes, memoryview))
+
+
+class CompressedTextAttribute(DeferredAttribute):
+    """Распаковывает значение при первом чтении и запоминает строку.
+
+    __set__ делает дескриптор приоритетнее __dict__ экземпляра,
+    иначе чтение атрибута обходило бы __get__.
+    """
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if instance is not None and isinstance(value, (bytes, memoryview)):
+            value = decompress_text(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class CompressedTextField(models.TextField):
+    descriptor_class = CompressedTextAttribute
+
+    def to_python(self, value):
+        return super().to_python(decompress_text(value))
+
+    def pre_save(self, model_instance, add):
+        # Непрочитанный текст сохраняется сжатым, без распаковки.
+        value = model_instance.__dict__.get(self.attname)
+        if isinstance(value, (bytes, memoryview)):
+            return value
+        return super().pre_save(model_instance, add)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, (bytes, memoryview)):
+            return value
+        value = super().get_db_prep_value(value, connection, prepared)
+        # Строки и BLOB в одной колонке допускает только SQLite.
+        if isinstance(value, str) and connection.vendor == 'sqlite':
+            return compress_text(value)
+        return value
@@ -1,28 +1,58 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Note
+from .models import Note, Tag
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
+TAGS_SEPARATOR = ','
+
+
+def parse_tags(value):
+    """Имена тегов из строки через запятую, без повторов и пустых."""
+    names = (name.strip().lower() for name in value.split(TAGS_SEPARATOR))
+    return list(dict.fromkeys(name for name in names if name))
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    tags = forms.CharField(
+        label='Теги',
+        required=False,
+        help_text='Перечислите теги через запятую'
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and not self.is_bound:
+            self.initial.setdefault('tags', ', '.join(sorted(
+                self.instance.tags.values_list('name', flat=True)
+            )))
+
+    def clean_tags(self):
+        names = parse_tags(self.cleaned_data['tags'])
+        max_length = Tag._meta.get_field('name').max_length
+        too_long = [name for name in names if len(name) > max_length]
+        if too_long:
+            raise ValidationError(
+                f'Тег длиннее {max_length} символов: {too_long[0]}'
+            )
+        return names
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        self.instance.set_tags(self.cleaned_data['tags'])
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
+        """Обрабатывает случай, если slug не уникален.
+
+        Пустой slug подбирается при сохранении заметки.
+        """
+        slug = self.cleaned_data.get('slug')
+        if slug and Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
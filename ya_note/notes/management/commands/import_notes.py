@@ -0,0 +1,105 @@
+import time
+import zipfile
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import slug_re
+from django.db import IntegrityError, transaction
+
+from notes.cache import bump_author_version
+from notes.export import EXTENSION, from_markdown
+from notes.models import SLUG_ATTEMPTS, Note
+from notes.search import index_notes
+from notes.slugs import slugify
+
+BATCH_SIZE = 1000
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Импорт заметок из zip-архива, выгруженного notes:export."""
+    help = (
+        'Загружает заметки пользователю из zip-архива файлов <slug>.md. '
+        'Первая строка «# заголовок» становится заголовком заметки. '
+        'Занятые slug получают суффикс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Zip-архив с заметками.')
+        parser.add_argument(
+            '--author', required=True,
+            help='Имя пользователя, которому добавляются заметки.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько заметок записывать в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            self.author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["author"]}.')
+        self.max_title_length = Note._meta.get_field('title').max_length
+        self.count = 0
+        started = time.monotonic()
+        try:
+            with zipfile.ZipFile(options['path']) as archive:
+                self.import_archive(archive, options['batch_size'])
+        except (OSError, zipfile.BadZipFile) as error:
+            raise CommandError(f'Не удалось прочитать архив: {error}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Заметок: {self.count}; '
+            f'{self.count / max(elapsed, 1e-6):.0f} заметок/с'
+        ))
+
+    def import_archive(self, archive, batch_size):
+        files = (
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.endswith(EXTENSION)
+        )
+        while True:
+            batch = list(islice(files, batch_size))
+            if not batch:
+                break
+            self.import_batch([self.read_note(archive, info)
+                               for info in batch])
+
+    def read_note(self, archive, info):
+        try:
+            content = archive.read(info).decode()
+        except UnicodeDecodeError:
+            raise CommandError(f'Файл {info.filename} не в UTF-8.')
+        title, text = from_markdown(content)
+        stem = info.filename.rsplit('/', 1)[-1][:-len(EXTENSION)]
+        note = Note(
+            author=self.author,
+            title=(title or stem)[:self.max_title_length],
+            text=text
+        )
+        # Имя файла сохраняется как slug, если это корректный slug.
+        note.slug = stem if slug_re.fullmatch(stem) else slugify(note.title)
+        note.render_html()
+        return note
+
+    def import_batch(self, notes):
+        bases = [note.slug for note in notes]
+        for attempt in range(SLUG_ATTEMPTS):
+            for note, slug in zip(notes, Note.objects.allocate_slugs(bases)):
+                note.slug = slug
+            try:
+                with transaction.atomic():
+                    Note.objects.bulk_create_notes(notes)
+                    index_notes(notes)
+                break
+            except IntegrityError:
+                # Slug заняли после подбора, подбираем заново.
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+        bump_author_version(self.author.pk)
+        self.count += len(notes)
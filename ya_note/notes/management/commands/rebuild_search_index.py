@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from notes.search import INDEX_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    """Заново строит полнотекстовый индекс заметок."""
+    help = 'Заполняет индекс поиска по заметкам по всем существующим записям.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=INDEX_BATCH_SIZE,
+            help='Сколько заметок индексировать за раз.'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_index(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано заметок: {count}')
+        )
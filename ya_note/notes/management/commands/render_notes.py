@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from notes.cache import bump_author_version
+from notes.models import Note
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    """Отрисовывает HTML заметок, у которых он устарел или отсутствует."""
+    help = (
+        'Заполняет HTML текста заметок. Перерисовываются только заметки, '
+        'чей текст или версия правил разметки изменились.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько заметок читать и записывать за раз.'
+        )
+
+    def handle(self, *args, **options):
+        notes = Note.objects.only(
+            'id', 'author_id', 'text', 'html_hash'
+        ).order_by('id')
+        total = rendered = 0
+        authors = set()
+        last_id = 0
+        while True:
+            batch = list(
+                notes.filter(id__gt=last_id)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            total += len(batch)
+            last_id = batch[-1].id
+            changed = [note for note in batch if note.render_html()]
+            # bulk_update не меняет updated_at: текст заметок прежний.
+            Note.objects.bulk_update(changed, ('html', 'html_hash'))
+            authors.update(note.author_id for note in changed)
+            rendered += len(changed)
+        for author_id in authors:
+            bump_author_version(author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заметок: {total}, перерисовано: {rendered}'
+        ))
@@ -0,0 +1,178 @@
+"""Преобразование Markdown в безопасный HTML.
+
+Поддерживается подмножество Markdown: заголовки, абзацы, списки,
+цитаты, блоки кода, горизонтальные линии, ссылки, выделение и код
+в строке. Весь исходный текст экранируется, а теги появляются только
+из разметки, поэтому сырой HTML из заметки в результат не попадает.
+Ссылки допускаются только на http(s), mailto и относительные адреса.
+"""
+import re
+from hashlib import sha256
+
+from django.utils.html import escape
+
+# Меняется вместе с правилами разметки, чтобы перерисовать заметки.
+RENDERER_VERSION = '3'
+
+FENCE = re.compile(r'^(`{3,}|~{3,})')
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE = re.compile(r'^ {0,3}([-*_])(\s*\1){2,}\s*$')
+QUOTE = re.compile(r'^ {0,3}> ?')
+BULLET = re.compile(r'^ {0,3}[-*+]\s+')
+NUMBER = re.compile(r'^ {0,3}\d{1,9}[.)]\s+')
+
+CODE_SPAN = re.compile(r'(`+)(.+?)\1', re.DOTALL)
+LINK = re.compile(r'\[([^\]\n]+)\]\(([^)\s]+)\)')
+AUTOLINK = re.compile(r'&lt;((?:https?://|mailto:)[^\s&]+)&gt;')
+STRONG = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__')
+EMPHASIS = re.compile(
+    r'\*(?=\S)(.+?)(?<=\S)\*|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)'
+)
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#|\.{0,2}/)', re.IGNORECASE)
+PLACEHOLDER = re.compile('\x00(\\d+)\x00')
+
+
+def content_hash(text):
+    """Ключ отрисованного HTML: текст заметки и версия правил."""
+    return sha256(f'{RENDERER_VERSION}\n{text}'.encode()).hexdigest()
+
+
+class InlineRenderer:
+    """Разметка внутри строки; готовые теги прячутся за метками."""
+
+    def __init__(self):
+        self.stash = []
+
+    def keep(self, html):
+        self.stash.append(html)
+        return f'\x00{len(self.stash) - 1}\x00'
+
+    def link(self, match):
+        text, url = match.groups()
+        if '\x00' in url:
+            # В адресе спрятанный код или автоссылка: их теги оказались
+            # бы внутри href, поэтому такая ссылка остаётся текстом.
+            return match[0]
+        if not SAFE_URL.match(url):
+            return text
+        return self.keep(f'<a href="{url}">{self.emphasis(text)}</a>')
+
+    def emphasis(self, text):
+        # Готовый <strong> прячется, чтобы <em> не начался внутри него
+        # и не закончился снаружи: **a _b** c_.
+        text = STRONG.sub(
+            lambda match: self.keep(
+                f'<strong>{self.italic(match[1] or match[2])}</strong>'
+            ),
+            text
+        )
+        return self.italic(text)
+
+    def italic(self, text):
+        return EMPHASIS.sub(
+            lambda match: f'<em>{match[1] or match[2]}</em>', text
+        )
+
+    def render(self, text):
+        parts = []
+        last = 0
+        for match in CODE_SPAN.finditer(text):
+            parts.append(escape(text[last:match.start()]))
+            parts.append(self.keep(
+                f'<code>{escape(match[2].strip())}</code>'
+            ))
+            last = match.end()
+        parts.append(escape(text[last:]))
+        html = ''.join(parts)
+        html = AUTOLINK.sub(
+            lambda match: self.keep(
+                f'<a href="{match[1]}">{match[1]}</a>'
+            ),
+            html
+        )
+        html = self.emphasis(LINK.sub(self.link, html))
+        while PLACEHOLDER.search(html):
+            html = PLACEHOLDER.sub(lambda match: self.stash[int(match[1])],
+                                   html)
+        return html
+
+
+def render_inline(text):
+    return InlineRenderer().render(text)
+
+
+def take_while(lines, start, predicate):
+    end = start
+    while end < len(lines) and predicate(lines[end]):
+        end += 1
+    return lines[start:end], end
+
+
+def render_list(lines, start, marker, tag):
+    items = []
+    index = start
+    while index < len(lines) and marker.match(lines[index]):
+        item = [marker.sub('', lines[index], count=1)]
+        index += 1
+        # Строки продолжения пункта идут с отступом.
+        while (index < len(lines) and lines[index].startswith(' ')
+               and lines[index].strip()
+               and not marker.match(lines[index])):
+            item.append(lines[index].strip())
+            index += 1
+        items.append(f'<li>{render_inline(" ".join(item))}</li>')
+    return f'<{tag}>{"".join(items)}</{tag}>', index
+
+
+def is_paragraph_line(line):
+    return bool(line.strip()) and not any(
+        pattern.match(line)
+        for pattern in (FENCE, HEADING, RULE, QUOTE, BULLET, NUMBER)
+    )
+
+
+def render_blocks(lines):
+    blocks = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        fence = FENCE.match(line)
+        if not line.strip():
+            index += 1
+        elif fence:
+            code, index = take_while(
+                lines, index + 1,
+                lambda line: not line.startswith(fence[1])
+            )
+            index += 1
+            blocks.append(f'<pre><code>{escape(chr(10).join(code))}'
+                          f'</code></pre>')
+        elif HEADING.match(line):
+            level, text = HEADING.match(line).groups()
+            level = len(level)
+            blocks.append(f'<h{level}>{render_inline(text)}</h{level}>')
+            index += 1
+        elif RULE.match(line):
+            blocks.append('<hr>')
+            index += 1
+        elif QUOTE.match(line):
+            quote, index = take_while(lines, index, QUOTE.match)
+            inner = render_blocks([QUOTE.sub('', line) for line in quote])
+            blocks.append(f'<blockquote>{inner}</blockquote>')
+        elif BULLET.match(line):
+            html, index = render_list(lines, index, BULLET, 'ul')
+            blocks.append(html)
+        elif NUMBER.match(line):
+            html, index = render_list(lines, index, NUMBER, 'ol')
+            blocks.append(html)
+        else:
+            paragraph, index = take_while(lines, index, is_paragraph_line)
+            text = '\n'.join(line.strip() for line in paragraph)
+            blocks.append(f'<p>{render_inline(text)}</p>')
+    return '\n'.join(blocks)
+
+
+def render_markdown(text):
+    """Безопасный HTML из Markdown-текста заметки."""
+    text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\x00', '')
+    return render_blocks(text.split('\n'))
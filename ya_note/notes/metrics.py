@@ -0,0 +1,308 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс пишет свои значения в собственный файл
+metrics_<pid>.db в каталоге <префикс>_METRICS_DIR через mmap, поэтому
+процессы-воркеры не блокируют друг друга, а /metrics суммирует файлы
+всех процессов. Без каталога значения хранятся в анонимной памяти
+процесса. Каталог нужно очищать при перезапуске сервиса, иначе
+счётчики продолжатся с прежних значений.
+
+Формат файла: 8 байт с числом занятых байт, затем записи
+[длина ключа: int32][ключ JSON, выровненный до 8 байт][значение: double].
+Запись добавляется целиком до обновления заголовка, поэтому читатель
+другого процесса видит только законченные записи.
+
+Модуль одинаков в ya_news и ya_note: настройки читаются с префиксом
+SETTINGS_PREFIX из apps.py приложения (NEWS или NOTES).
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from .apps import SETTINGS_PREFIX
+
+INITIAL_SIZE = 1 << 16
+HEADER = struct.Struct('<q')
+LENGTH = struct.Struct('<i')
+VALUE = struct.Struct('<d')
+FILE_PATTERN = 'metrics_*.db'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    float('inf'),
+)
+
+
+def padding(length):
+    return -(LENGTH.size + length) % 8
+
+
+def read_entries(data):
+    """Ключи, значения и их смещения из содержимого файла метрик."""
+    if len(data) < HEADER.size:
+        return
+    used = HEADER.unpack_from(data)[0]
+    position = HEADER.size
+    while position < used:
+        length = LENGTH.unpack_from(data, position)[0]
+        key_start = position + LENGTH.size
+        value_position = key_start + length + padding(length)
+        yield (
+            data[key_start:key_start + length].decode(),
+            VALUE.unpack_from(data, value_position)[0],
+            value_position,
+        )
+        position = value_position + VALUE.size
+
+
+class MetricsFile:
+    """Значения метрик одного процесса в mmap файла или памяти."""
+
+    def __init__(self, path=None):
+        self.fd = None
+        if path is None:
+            self.mmap = mmap.mmap(-1, INITIAL_SIZE)
+        else:
+            self.fd = os.open(path, os.O_RDWR | os.O_CREAT)
+            if os.fstat(self.fd).st_size < INITIAL_SIZE:
+                os.ftruncate(self.fd, INITIAL_SIZE)
+            self.mmap = mmap.mmap(self.fd, 0)
+        self.used = HEADER.unpack_from(self.mmap)[0] or HEADER.size
+        # Файл процесса с тем же pid продолжает прежние значения.
+        self.positions = {
+            key: position for key, _, position in read_entries(self.mmap)
+        }
+
+    def grow(self, size):
+        if self.fd is None:
+            grown = mmap.mmap(-1, size)
+            grown[:self.used] = self.mmap[:self.used]
+        else:
+            self.mmap.close()
+            os.ftruncate(self.fd, size)
+            grown = mmap.mmap(self.fd, 0)
+        self.mmap = grown
+
+    def add_key(self, key):
+        encoded = key.encode()
+        position = self.used + LENGTH.size + len(encoded) + padding(
+            len(encoded)
+        )
+        end = position + VALUE.size
+        if end > len(self.mmap):
+            self.grow(max(len(self.mmap) * 2, end))
+        LENGTH.pack_into(self.mmap, self.used, len(encoded))
+        self.mmap[self.used + LENGTH.size:
+                  self.used + LENGTH.size + len(encoded)] = encoded
+        VALUE.pack_into(self.mmap, position, 0.0)
+        self.used = end
+        HEADER.pack_into(self.mmap, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self.add_key(key)
+        value = VALUE.unpack_from(self.mmap, position)[0]
+        VALUE.pack_into(self.mmap, position, value + amount)
+
+    def entries(self):
+        return read_entries(self.mmap)
+
+
+class Registry:
+    """Хранилище метрик процесса; после fork открывает свой файл."""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else None
+        self.lock = threading.Lock()
+        self.pid = None
+        self.file = None
+
+    def get_file(self):
+        pid = os.getpid()
+        if pid != self.pid:
+            path = None
+            if self.directory is not None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path = self.directory / f'metrics_{pid}.db'
+            self.file = MetricsFile(path)
+            self.pid = pid
+        return self.file
+
+    def inc_many(self, amounts):
+        with self.lock:
+            metrics_file = self.get_file()
+            for key, amount in amounts:
+                metrics_file.inc(key, amount)
+
+    def collect(self):
+        """Суммы значений по ключам во всех процессах."""
+        totals = defaultdict(float)
+        if self.directory is None:
+            with self.lock:
+                entries = list(self.get_file().entries())
+        else:
+            entries = [
+                entry for path in self.directory.glob(FILE_PATTERN)
+                for entry in read_entries(path.read_bytes())
+            ]
+        for key, value, _ in entries:
+            totals[key] += value
+        return totals
+
+
+def make_key(name, labels):
+    return json.dumps([name, labels], ensure_ascii=False)
+
+
+class Counter:
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.keys = {}
+
+    def inc(self, labels, amount=1.0):
+        key = self.keys.get(labels)
+        if key is None:
+            key = self.keys[labels] = make_key(self.name, labels)
+        self.registry.inc_many(((key, amount),))
+
+
+class Histogram:
+    """Гистограмма с фиксированными кумулятивными корзинами."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation,
+                 buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.keys = {}
+
+    def make_keys(self, labels):
+        return (
+            [
+                make_key(f'{self.name}_bucket',
+                         labels + (('le', format_bound(bound)),))
+                for bound in self.buckets
+            ],
+            make_key(f'{self.name}_sum', labels),
+            make_key(f'{self.name}_count', labels),
+        )
+
+    def observe(self, labels, value):
+        keys = self.keys.get(labels)
+        if keys is None:
+            keys = self.keys[labels] = self.make_keys(labels)
+        bucket_keys, sum_key, count_key = keys
+        first = bisect_left(self.buckets, value)
+        # Нижние корзины получают 0, чтобы в выводе были все корзины.
+        self.registry.inc_many(
+            [(key, float(index >= first))
+             for index, key in enumerate(bucket_keys)]
+            + [(sum_key, value), (count_key, 1.0)]
+        )
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def escape_label(value):
+    return (
+        value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    )
+
+
+def sample_order(item):
+    (name, labels), _ = item
+    le = dict(labels).get('le')
+    return (
+        [pair for pair in labels if pair[0] != 'le'],
+        not name.endswith('_bucket'),
+        float(le) if le else 0.0,
+        name,
+    )
+
+
+def render(registry, metrics):
+    """Текст для /metrics со всеми процессами."""
+    samples = defaultdict(list)
+    for key, value in registry.collect().items():
+        name, labels = json.loads(key)
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in metrics:
+                family = name[:-len(suffix)]
+        samples[family].append(((name, labels), value))
+    lines = []
+    for metric in metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for (name, labels), value in sorted(
+            samples[metric.name], key=sample_order
+        ):
+            if labels:
+                label_text = ','.join(
+                    f'{label}="{escape_label(label_value)}"'
+                    for label, label_value in labels
+                )
+                name = f'{name}{{{label_text}}}'
+            lines.append(f'{name} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry(
+    getattr(settings, f'{SETTINGS_PREFIX}_METRICS_DIR')
+)
+REQUESTS = Counter(
+    REGISTRY, 'http_requests_total', 'Число HTTP-запросов.'
+)
+LATENCY = Histogram(
+    REGISTRY, 'http_request_duration_seconds',
+    'Время ответа на HTTP-запрос в секундах.'
+)
+METRICS = {metric.name: metric for metric in (REQUESTS, LATENCY)}
+
+
+def render_metrics():
+    return render(REGISTRY, METRICS)
+
+
+class MetricsMiddleware:
+    """Считает запросы и время ответа по имени URL, методу и статусу."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        labels = (
+            ('url_name', match.view_name if match else 'unresolved'),
+            ('method', request.method if request.method in METHODS
+             else 'other'),
+            ('status', str(response.status_code)),
+        )
+        REQUESTS.inc(labels)
+        LATENCY.observe(labels, duration)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0003_note_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField(verbose_name='id заметки')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Удалена')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'updated_at', 'id'], name='note_author_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletednote',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='deletednote',
+            index=models.Index(fields=['author', 'deleted_at', 'id'], name='deleted_note_author_idx'),
+        ),
+    ]
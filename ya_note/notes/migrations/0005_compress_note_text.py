@@ -0,0 +1,63 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:03
+
+import zlib
+
+from django.conf import settings
+from django.db import migrations
+import notes.fields
+
+BATCH_SIZE = 500
+
+
+def convert_texts(apps, schema_editor, convert, condition):
+    """Переписывает подходящие тексты пачками по id."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    last_id = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f'SELECT id, text FROM notes_note '
+                f'WHERE id > %s AND {condition} ORDER BY id LIMIT %s',
+                (last_id, BATCH_SIZE)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                'UPDATE notes_note SET text = %s WHERE id = %s',
+                [(convert(text), pk) for pk, text in rows]
+            )
+            last_id = rows[-1][0]
+
+
+def compress_texts(apps, schema_editor):
+    convert_texts(
+        apps, schema_editor, notes.fields.compress_text,
+        f"typeof(text) = 'text' AND length(CAST(text AS BLOB)) "
+        f'>= {int(settings.NOTES_TEXT_COMPRESS_THRESHOLD)}'
+    )
+
+
+def decompress_texts(apps, schema_editor):
+    convert_texts(
+        apps, schema_editor, lambda text: zlib.decompress(text).decode(),
+        "typeof(text) = 'blob'"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
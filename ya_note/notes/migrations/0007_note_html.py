@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:14
+
+from django.db import migrations, models
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='html',
+            field=notes.fields.CompressedTextField(blank=True, editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='html_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хеш отрисованного текста'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+CHANGE_COUNTER_ID = 1
+
+
+def number_rows(schema_editor, table, order, first):
+    """Нумерует строки таблицы по порядку изменения, начиная с first."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT id FROM {table} ORDER BY {order}')
+        ids = [pk for pk, in cursor.fetchall()]
+        for start in range(0, len(ids), BATCH_SIZE):
+            cursor.executemany(
+                f'UPDATE {table} SET change = %s WHERE id = %s',
+                [(first + start + offset, pk) for offset, pk in enumerate(
+                    ids[start:start + BATCH_SIZE]
+                )]
+            )
+    return first + len(ids)
+
+
+def number_changes(apps, schema_editor):
+    """Номера существующих изменений продолжают порядок по времени."""
+    change = number_rows(schema_editor, 'notes_note', 'updated_at, id', 1)
+    change = number_rows(
+        schema_editor, 'notes_deletednote', 'deleted_at, id', change
+    )
+    apps.get_model('notes', 'ChangeCounter').objects.create(
+        pk=CHANGE_COUNTER_ID, value=change - 1
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Номер изменения')),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='deletednote',
+            name='deleted_note_author_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='note',
+            name='note_author_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='deletednote',
+            name='change',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='change',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='deletednote',
+            index=models.Index(fields=['author', 'change'], name='deleted_note_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'change'], name='note_author_change_idx'),
+        ),
+        migrations.RunPython(number_changes, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,126 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
 
-from pytils.translit import slugify
+from .cache import bump_author_version
+from .fields import CompressedTextField, is_unpacked
+from .markdown import content_hash, render_markdown
+from .slugs import DEFAULT_SLUG, first_free, slug_family, slugify
+
+# Сколько основ slug проверять одним запросом в пакетном режиме.
+SLUG_BASES_PER_QUERY = 100
+SLUG_ATTEMPTS = 3
+# Запас до лимита SQLite на число параметров в одном запросе.
+SLUGS_PER_QUERY = 500
+CHANGE_COUNTER_ID = 1
+
+
+class ChangeCounter(models.Model):
+    """Последний выданный номер изменения заметок; одна строка."""
+    value = models.BigIntegerField('Номер изменения', default=0)
+
+
+def allocate_changes(count=1):
+    """Номера для count изменений заметок, по возрастанию.
+
+    Вызывается в транзакции изменения. Обновление счётчика блокирует
+    его строку до фиксации транзакции, поэтому номера растут в порядке
+    фиксации, в отличие от времени, взятого до неё: синхронизация
+    по номеру не пропустит изменение, зафиксированное позже
+    выданного клиенту.
+    """
+    if not count:
+        return range(0)
+    counter = ChangeCounter.objects.filter(pk=CHANGE_COUNTER_ID)
+    if not counter.update(value=F('value') + count):
+        ChangeCounter.objects.get_or_create(pk=CHANGE_COUNTER_ID)
+        counter.update(value=F('value') + count)
+    last = counter.values_list('value', flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+class NoteQuerySet(models.QuerySet):
+
+    def _slug_max_length(self):
+        return self.model._meta.get_field('slug').max_length
+
+    def _taken_slugs(self, bases, max_length):
+        query = Q()
+        for base in bases:
+            query |= slug_family(base, max_length)
+        return set(self.filter(query).values_list('slug', flat=True))
+
+    def allocate_slug(self, base):
+        """Свободный slug на основе base за один запрос."""
+        max_length = self._slug_max_length()
+        base = base[:max_length] or DEFAULT_SLUG
+        return first_free(
+            base, self._taken_slugs((base,), max_length), max_length
+        )
+
+    def allocate_slugs(self, bases, reserved=(), released=()):
+        """Уникальные slug для пачки основ, в том числе совпадающих.
+
+        Один запрос делается на каждые SLUG_BASES_PER_QUERY разных основ,
+        а не на каждую строку. reserved — slug, которые заняты помимо
+        базы, released — slug из базы, которые освобождаются.
+        """
+        max_length = self._slug_max_length()
+        bases = [base[:max_length] or DEFAULT_SLUG for base in bases]
+        unique_bases = list(dict.fromkeys(bases))
+        taken = set()
+        for start in range(0, len(unique_bases), SLUG_BASES_PER_QUERY):
+            taken |= self._taken_slugs(
+                unique_bases[start:start + SLUG_BASES_PER_QUERY], max_length
+            )
+        taken = taken - set(released) | set(reserved)
+        slugs = []
+        for base in bases:
+            slug = first_free(base, taken, max_length)
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def bulk_create_notes(self, notes):
+        """bulk_create, после которого у всех заметок есть id.
+
+        Заметки получают номера изменений. Без RETURNING id новых
+        заметок находятся по уникальному slug.
+        """
+        if not notes:
+            return notes
+        with transaction.atomic(using=self.db, savepoint=False):
+            for note, change in zip(notes, allocate_changes(len(notes))):
+                note.change = change
+            notes = self.bulk_create(notes)
+        if connections[self.db].features.can_return_rows_from_bulk_insert:
+            return notes
+        slugs = [note.slug for note in notes]
+        ids = {}
+        for start in range(0, len(slugs), SLUGS_PER_QUERY):
+            ids.update(self.filter(
+                slug__in=slugs[start:start + SLUGS_PER_QUERY]
+            ).values_list('slug', 'pk'))
+        for note in notes:
+            note.pk = ids[note.slug]
+        return notes
+
+    def tagged(self, author, names, match_all=True):
+        """Заметки автора со всеми (или любым) из тегов одним запросом.
+
+        Кандидаты берутся по индексу (author, tag) связей, а наличие
+        остальных тегов при match_all проверяется по индексу (tag, note).
+        """
+        names = list(dict.fromkeys(names))
+        notes = self.filter(id__in=NoteTag.objects.filter(
+            author=author, tag__name__in=names[:1] if match_all else names
+        ).values('note_id'))
+        if match_all:
+            for name in names[1:]:
+                notes = notes.filter(Exists(NoteTag.objects.filter(
+                    note=OuterRef('pk'), tag__name=name
+                )))
+        return notes
 
 
 class Note(models.Model):
@@ -11,7 +130,7 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -27,12 +146,160 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+    change = models.BigIntegerField(
+        'Номер изменения', default=0, editable=False
+    )
+    html = CompressedTextField('HTML текста', blank=True, editable=False)
+    html_hash = models.CharField(
+        'Хеш отрисованного текста', max_length=64, blank=True, editable=False
+    )
+    tags = models.ManyToManyField(
+        'Tag',
+        through='NoteTag',
+        related_name='notes',
+        blank=True,
+        verbose_name='Теги'
+    )
+
+    objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+            models.Index(
+                fields=('author', 'change'), name='note_author_change_idx'
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    def render_html(self):
+        """Перерисовывает HTML, если текст изменился; True, если изменился.
+
+        Непрочитанный текст не менялся, его HTML не трогаем.
+        """
+        if not is_unpacked(self, 'text'):
+            return False
+        text_hash = content_hash(self.text)
+        if text_hash == self.html_hash:
+            return False
+        self.html = render_markdown(self.text)
+        self.html_hash = text_hash
+        return True
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """Сохраняет заметку, подбирая свободный slug, если он не задан.
+
+        Если подобранный slug успели занять между выбором и записью,
+        выбор повторяется. Занятый явно указанный slug приводит
+        к IntegrityError.
+        """
+        self.render_html()
+        if self.slug:
+            return self.save_change(*args, **kwargs)
+        base = slugify(self.title)
+        notes = Note.objects.all()
+        if self.pk is not None:
+            notes = notes.exclude(pk=self.pk)
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = notes.allocate_slug(base)
+            try:
+                return self.save_change(*args, **kwargs)
+            except IntegrityError:
+                self.slug = ''
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+
+    def save_change(self, *args, **kwargs):
+        with transaction.atomic():
+            self.change = allocate_changes()[0]
+            return super().save(*args, **kwargs)
+
+    def set_tags(self, names):
+        """Заменяет теги заметки; недостающие теги создаются."""
+        tags = Tag.objects.get_or_create_many(names)
+        NoteTag.objects.filter(note=self).exclude(tag__in=tags).delete()
+        NoteTag.objects.bulk_create(
+            (NoteTag(note=self, tag=tag, author_id=self.author_id)
+             for tag in tags),
+            ignore_conflicts=True
+        )
+        bump_author_version(self.author_id)
+
+
+class TagQuerySet(models.QuerySet):
+
+    def get_or_create_many(self, names):
+        """Теги с данными именами за два запроса при любом их числе."""
+        names = list(dict.fromkeys(names))
+        self.bulk_create((Tag(name=name) for name in names),
+                         ignore_conflicts=True)
+        return list(self.filter(name__in=names))
+
+    def counts_for(self, author):
+        """Пары (имя тега, число заметок автора) одним запросом.
+
+        Группировка идёт по индексу (author, tag) связей, имена тегов
+        подставляются подзапросом по первичному ключу.
+        """
+        counts = NoteTag.objects.filter(author=author).values(
+            'tag_id'
+        ).annotate(
+            notes_count=Count('*'),
+            name=Subquery(self.filter(pk=OuterRef('tag_id')).values('name'))
+        ).order_by('tag_id')
+        return sorted(
+            (item['name'], item['notes_count']) for item in counts
+        )
+
+
+class Tag(models.Model):
+    name = models.CharField('Название', max_length=50, unique=True)
+
+    objects = TagQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTag(models.Model):
+    """Связь заметки с тегом; автор продублирован для подсчётов."""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('tag', 'note'), name='note_tag_unique'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('author', 'tag'), name='note_tag_author_idx'),
+        )
+
+
+class DeletedNote(models.Model):
+    """Запись об удалённой заметке для дельта-синхронизации."""
+    note_id = models.BigIntegerField('id заметки')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    deleted_at = models.DateTimeField('Удалена', auto_now_add=True)
+    change = models.BigIntegerField(
+        'Номер изменения', default=0, editable=False
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'change'),
+                name='deleted_note_change_idx'
+            ),
+        )
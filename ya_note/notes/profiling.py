@@ -0,0 +1,188 @@
+"""Профилирование отдельных запросов на боевых данных.
+
+Запрос с параметром ``profile`` выполняется под профилировщиком, если
+его делает сотрудник или он несёт подпись ``profile_token`` для своего
+пути (make_profile_token), действующую <префикс>_PROFILE_TOKEN_MAX_AGE
+секунд. ``profile=sample`` включает выборочный профилировщик: отдельный
+поток раз в <префикс>_PROFILE_SAMPLE_INTERVAL секунд записывает стек
+запроса, результат сохраняется в свёрнутом формате flamegraph.pl
+(``.folded``). Любое другое значение включает cProfile, результат
+сохраняется файлом pstats (``.prof``).
+
+Файлы лежат в <префикс>_PROFILE_DIR с именем URL, временем и длительностью
+запроса в названии; хранятся последние <префикс>_PROFILE_KEEP файлов.
+Имя файла возвращается в заголовке X-Profile.
+
+Модуль одинаков в ya_news и ya_note: настройки читаются с префиксом
+SETTINGS_PREFIX из apps.py приложения (NEWS или NOTES).
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+from .apps import SETTINGS_PREFIX
+
+PARAMETER = 'profile'
+TOKEN_PARAMETER = 'profile_token'
+SAMPLE = 'sample'
+SALT = __name__
+PROFILE_NAME = re.compile(
+    r'^(?P<url_name>[\w.-]+)__(?P<started>\d{8}T\d{12})'
+    r'__(?P<duration>\d+)ms\.(?P<kind>prof|folded)$'
+)
+
+
+def setting(name):
+    return getattr(settings, f'{SETTINGS_PREFIX}_{name}')
+
+
+def make_profile_token(path):
+    """Подпись, разрешающая профилировать запросы к пути."""
+    return signing.TimestampSigner(salt=SALT).sign(path)
+
+
+def has_valid_token(request):
+    token = request.GET.get(TOKEN_PARAMETER)
+    if not token:
+        return False
+    try:
+        path = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=setting('PROFILE_TOKEN_MAX_AGE')
+        )
+    except signing.BadSignature:
+        return False
+    return path == request.path
+
+
+def frame_name(frame):
+    code = frame.f_code
+    filename = code.co_filename.rpartition('site-packages/')[2]
+    project_dir = f'{settings.BASE_DIR}{os.sep}'
+    if filename.startswith(project_dir):
+        filename = filename[len(project_dir):]
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def fold_stack(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Поток, собирающий стеки другого потока через интервалы."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold_stack(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def dump(self, path):
+        Path(path).write_text(''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        ))
+
+
+class CProfiler:
+    """cProfile с тем же интерфейсом, что у Sampler."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+def list_profiles(directory, limit=None):
+    """Сохранённые профили, начиная с последнего."""
+    profiles = []
+    if directory.is_dir():
+        for path in directory.iterdir():
+            match = PROFILE_NAME.match(path.name)
+            if match:
+                profiles.append({
+                    'name': path.name,
+                    'url_name': match['url_name'].replace('.', ':'),
+                    'started': datetime.strptime(
+                        match['started'], '%Y%m%dT%H%M%S%f'
+                    ),
+                    'duration_ms': int(match['duration']),
+                    'kind': match['kind'],
+                })
+    profiles.sort(key=lambda profile: profile['started'], reverse=True)
+    return profiles[:limit]
+
+
+def prune_profiles(directory, keep):
+    for profile in list_profiles(directory)[keep:]:
+        (directory / profile['name']).unlink(missing_ok=True)
+
+
+class ProfilerMiddleware:
+    """Профилирует запросы сотрудников и запросы с подписью."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get(PARAMETER)
+        if mode is None or not (
+                request.user.is_staff or has_valid_token(request)
+        ):
+            return self.get_response(request)
+        if mode == SAMPLE:
+            profiler = Sampler(
+                threading.get_ident(), setting('PROFILE_SAMPLE_INTERVAL')
+            )
+        else:
+            profiler = CProfiler()
+        started = datetime.now()
+        started_time = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - started_time
+        match = request.resolver_match
+        url_name = match.view_name if match else 'unresolved'
+        directory = Path(setting('PROFILE_DIR'))
+        directory.mkdir(parents=True, exist_ok=True)
+        name = (
+            f'{url_name.replace(":", ".")}__'
+            f'{started:%Y%m%dT%H%M%S%f}__{duration * 1000:.0f}ms.'
+            f'{"folded" if mode == SAMPLE else "prof"}'
+        )
+        profiler.dump(os.fspath(directory / name))
+        prune_profiles(directory, setting('PROFILE_KEEP'))
+        response['X-Profile'] = name
+        return response
@@ -0,0 +1,113 @@
+"""Полнотекстовый поиск по заметкам на SQLite FTS5.
+
+Индекс ``notes_note_fts`` хранит заголовок и текст заметок под их id
+и обновляется сигналами при сохранении и удалении заметки. На других
+СУБД поиск работает через icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .fields import is_unpacked
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+INDEX_BATCH_SIZE = 1000
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def index_notes(notes, full=False):
+    """Добавляет заметки в индекс или обновляет их там.
+
+    Если не задан full, у заметок, текст которых не читали, обновляется
+    только заголовок, чтобы не распаковывать текст ради индекса.
+    """
+    if not is_supported():
+        return
+    rows, titles = [], []
+    for note in notes:
+        if full or is_unpacked(note, 'text'):
+            rows.append((note.pk, note.title, note.text))
+        else:
+            titles.append((note.title, note.pk))
+    with connection.cursor() as cursor:
+        if titles:
+            cursor.executemany(
+                f'UPDATE {FTS_TABLE} SET title = %s WHERE rowid = %s', titles
+            )
+        if not rows:
+            return
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk, *_ in rows]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, text) '
+            f'VALUES (%s, %s, %s)',
+            rows
+        )
+
+
+def unindex_notes(ids):
+    if not ids or not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in ids]
+        )
+
+
+def rebuild_index(batch_size=INDEX_BATCH_SIZE):
+    """Заново строит индекс по всем заметкам, читая их пачками."""
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    batch = []
+    count = 0
+    notes = Note.objects.only('id', 'title', 'text').iterator(
+        chunk_size=batch_size
+    )
+    for note in notes:
+        batch.append(note)
+        if len(batch) == batch_size:
+            index_notes(batch, full=True)
+            count += len(batch)
+            batch = []
+    index_notes(batch, full=True)
+    return count + len(batch)
+
+
+def build_match_query(text):
+    """Запрос FTS5 из слов пользователя: все слова, по префиксу.
+
+    Слова берутся в кавычки, поэтому синтаксис FTS5 во вводе
+    пользователя не интерпретируется.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def search_notes(author, text, offset, limit):
+    """Заметки автора, подходящие под запрос, от лучших к худшим."""
+    match = build_match_query(text)
+    if not match:
+        return []
+    if not is_supported():
+        notes = Note.objects.filter(author=author).filter(
+            Q(title__icontains=text) | Q(text__icontains=text)
+        ).only('id', 'slug', 'title').order_by('id')
+        return list(notes[offset:offset + limit])
+    return list(Note.objects.raw(
+        f'SELECT note.id, note.slug, note.title, '
+        f'bm25({FTS_TABLE}) AS rank '
+        f'FROM {FTS_TABLE} '
+        f'JOIN notes_note AS note ON note.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND note.author_id = %s '
+        f'ORDER BY rank LIMIT %s OFFSET %s',
+        (match, author.pk, limit, offset)
+    ))
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_author_version
+from .models import DeletedNote, Note, allocate_changes
+from .search import index_notes, unindex_notes
+
+
+@receiver(post_save, sender=Note)
+def index_note(sender, instance, **kwargs):
+    index_notes((instance,))
+
+
+@receiver(post_delete, sender=Note)
+def unindex_note(sender, instance, **kwargs):
+    unindex_notes((instance.pk,))
+
+
+@receiver(post_delete, sender=Note)
+def remember_deleted_note(sender, instance, **kwargs):
+    DeletedNote.objects.create(
+        note_id=instance.pk, author_id=instance.author_id,
+        change=allocate_changes()[0]
+    )
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_author_cache(sender, instance, **kwargs):
+    bump_author_version(instance.author_id)
+
+
+@receiver(post_delete, sender=get_user_model())
+def forget_deleted_notes(sender, instance, **kwargs):
+    """Записи об удалении заметок, появившиеся при удалении автора."""
+    DeletedNote.objects.filter(author_id=instance.pk).delete()
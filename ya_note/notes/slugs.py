@@ -0,0 +1,84 @@
+"""Построение slug из заголовков и подбор свободного slug.
+
+slugify даёт тот же результат, что и pytils.translit.slugify, но вместо
+нескольких проходов регулярными выражениями по тексту делает одну замену
+и один str.translate по таблице, построенной заранее.
+
+Свободный slug ищется среди вариантов ``slug``, ``slug-2``, ``slug-3``…:
+занятые варианты выбираются одним запросом по диапазону уникального
+индекса, а свободный суффикс подбирается в памяти.
+"""
+import re
+from functools import lru_cache
+
+from django.db.models import Q
+from pytils.translit import ALPHABET, TRANSTABLE
+
+# Место под суффикс вида «-123456789» в конце slug.
+SUFFIX_RESERVE = 10
+DEFAULT_SLUG = 'note'
+SLUGIFY_CACHE_SIZE = 4096
+
+HYPHENS = re.compile(r'[-\s]+')
+NOT_SLUG_CHARS = re.compile(r'[^\w\s-]')
+
+
+class TranslitTable(dict):
+    """Таблица для str.translate: символы вне алфавита удаляются."""
+
+    def __missing__(self, char):
+        return None
+
+
+def build_translit_table():
+    """Транслитерация с последующей очисткой, как в pytils, для символа.
+
+    В pytils после фильтра по алфавиту строка транслитерируется,
+    затем из неё удаляется всё, кроме букв, цифр, пробелов и дефисов,
+    и она приводится к нижнему регистру; здесь это заранее сделано
+    для каждого символа.
+    """
+    replacements = {}
+    for char, latin in TRANSTABLE:
+        replacements.setdefault(char, latin)
+    table = TranslitTable()
+    for char in ALPHABET:
+        if len(char) == 1:
+            latin = replacements.get(char, char)
+            table[ord(char)] = NOT_SLUG_CHARS.sub('', latin).lower()
+    return table
+
+
+TRANSLIT_TABLE = build_translit_table()
+
+
+@lru_cache(maxsize=SLUGIFY_CACHE_SIZE)
+def slugify(value):
+    """Slug из строки, совпадающий с pytils.translit.slugify."""
+    value = str(value).lower().replace('&amp;', ' and ').replace('&', ' and ')
+    return HYPHENS.sub('-', value).translate(TRANSLIT_TABLE)
+
+
+def slugify_many(values):
+    """Пакетный slugify для импорта: повторы берутся из кеша."""
+    return [slugify(value) for value in values]
+
+
+def get_stem(base, max_length):
+    return base[:max_length - SUFFIX_RESERVE]
+
+
+def slug_family(base, max_length):
+    """Условие на сам slug и все его варианты с суффиксами."""
+    stem = get_stem(base, max_length)
+    return Q(slug=base) | Q(slug__gt=f'{stem}-', slug__lt=f'{stem}.')
+
+
+def first_free(base, taken, max_length):
+    if base not in taken:
+        return base
+    stem = get_stem(base, max_length)
+    number = 2
+    while f'{stem}-{number}' in taken:
+        number += 1
+    return f'{stem}-{number}'
@@ -0,0 +1,89 @@
+"""Дельта-синхронизация заметок по номерам изменений.
+
+Каждая запись заметки и каждая запись об удалении получают номер
+изменения (allocate_changes), растущий в порядке фиксации транзакций.
+Курсор хранит два номера: последней выданной изменённой заметки
+и последней выданной записи об удалении. Обе ленты читаются
+по индексам от своего номера, поэтому стоимость синхронизации зависит
+от числа изменений, а не от числа заметок.
+"""
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import DeletedNote, Note
+
+# Номер до первой записи ленты.
+START = 0
+# Наибольшее целое SQLite; большие числа в запросе поднимают OverflowError.
+MAX_CHANGE = 2 ** 63 - 1
+
+
+def encode_cursor(notes_change, deleted_change):
+    return urlsafe_base64_encode(
+        f'{notes_change}|{deleted_change}'.encode()
+    )
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; при любой ошибке поднимает ValueError."""
+    try:
+        changes = [
+            int(part)
+            for part in urlsafe_base64_decode(cursor).decode().split('|')
+        ]
+        if len(changes) != 2 or not all(
+                START <= change <= MAX_CHANGE for change in changes
+        ):
+            raise ValueError
+        return changes
+    except (TypeError, ValueError):
+        raise ValueError(f'Некорректный курсор: {cursor!r}')
+
+
+def after(queryset, change, limit):
+    """Записи ленты с номером больше change, по порядку, не больше limit."""
+    return list(
+        queryset.filter(change__gt=change).order_by('change')[:limit]
+    )
+
+
+def last_change(queryset):
+    last = queryset.order_by('-change').first()
+    return last.change if last else START
+
+
+def get_changes(author, cursor, limit):
+    """Изменения заметок автора после курсора.
+
+    Без курсора выдаются все заметки, а записи об удалениях
+    пропускаются: клиенту, у которого ещё нет заметок, они не нужны.
+    """
+    notes = Note.objects.filter(author=author)
+    deleted = DeletedNote.objects.filter(author=author)
+    if cursor:
+        notes_change, deleted_change = decode_cursor(cursor)
+    else:
+        notes_change = START
+        deleted_change = last_change(deleted)
+    changed = after(notes, notes_change, limit + 1)
+    removed = after(deleted, deleted_change, limit + 1)
+    has_more = len(changed) > limit or len(removed) > limit
+    changed, removed = changed[:limit], removed[:limit]
+    if changed:
+        notes_change = changed[-1].change
+    if removed:
+        deleted_change = removed[-1].change
+    return {
+        'notes': [
+            {
+                'id': note.pk,
+                'slug': note.slug,
+                'title': note.title,
+                'text': note.text,
+                'updated_at': note.updated_at,
+            }
+            for note in changed
+        ],
+        'deleted': [item.note_id for item in removed],
+        'cursor': encode_cursor(notes_change, deleted_change),
+        'has_more': has_more,
+    }
@@ -0,0 +1,249 @@
+"""Замеры производительности.
+
+Не входят в обычный прогон тестов, запускаются так:
+BENCHMARK=1 pytest -s notes/tests/test_benchmarks.py
+Число заметок задаётся переменной BENCHMARK_NOTES, размер текстов
+для замера сжатия — BENCHMARK_TEXT_KB, число заметок пользователя
+для замера тегов — BENCHMARK_TAGGED_NOTES.
+"""
+import os
+import random
+from timeit import timeit
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from pytils.translit import slugify as pytils_slugify
+
+from notes.models import Note, NoteTag, Tag
+from notes.views import NotesList
+from notes.search import FTS_TABLE, search_notes
+from notes.slugs import slugify, slugify_many
+
+User = get_user_model()
+
+NOTES_COUNT = int(os.environ.get('BENCHMARK_NOTES', 1_000_000))
+AUTHORS_COUNT = 10
+BATCH_SIZE = 10_000
+# Редкое слово встречается в одной заметке из RARE_EVERY.
+RARE_WORD = 'тайник'
+RARE_EVERY = 1000
+TEXT_KB = int(os.environ.get('BENCHMARK_TEXT_KB', 2048))
+TAGGED_NOTES_COUNT = int(os.environ.get('BENCHMARK_TAGGED_NOTES', 100_000))
+TAGS_PER_NOTE = 3
+WORDS = (
+    'заметка', 'список', 'покупки', 'молоко', 'хлеб', 'встреча', 'проект',
+    'отчёт', 'звонок', 'идея', 'книга', 'фильм', 'рецепт', 'борщ', 'отпуск',
+    'билеты', 'врач', 'машина', 'ремонт', 'подарок',
+)
+
+
+@skipUnless(os.environ.get('BENCHMARK'), 'Нужна переменная BENCHMARK.')
+class TestSearchBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = User.objects.bulk_create(
+            User(username=f'user{index}') for index in range(AUTHORS_COUNT)
+        )
+        cls.author = User.objects.get(username=authors[0].username)
+        author_ids = list(User.objects.values_list('id', flat=True))
+        rand = random.Random(0)
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            for start in range(0, NOTES_COUNT, BATCH_SIZE):
+                rows = []
+                for index in range(start, min(start + BATCH_SIZE,
+                                              NOTES_COUNT)):
+                    title = ' '.join(rand.choices(WORDS, k=3))
+                    text = ' '.join(rand.choices(WORDS, k=40))
+                    if index % RARE_EVERY == 0:
+                        text += f' {RARE_WORD}'
+                    rows.append((index + 1, title, text, f'n{index}',
+                                 author_ids[index % AUTHORS_COUNT], now,
+                                 '', '', index + 1))
+                cursor.executemany(
+                    'INSERT INTO notes_note (id, title, text, slug, '
+                    'author_id, updated_at, html, html_hash, change) '
+                    'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)', rows
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, text) '
+                    f'VALUES (%s, %s, %s)',
+                    [row[:3] for row in rows]
+                )
+
+    def test_fts_vs_icontains(self):
+        """FTS5 с bm25 против icontains по заголовку и тексту."""
+        for query in (RARE_WORD, 'борщ', 'молоко хлеб'):
+            fts_time = timeit(
+                lambda: search_notes(self.author, query, 0, 20), number=5
+            ) / 5
+            first_word = query.split()[0]
+            icontains_time = timeit(
+                lambda: list(Note.objects.filter(author=self.author).filter(
+                    Q(title__icontains=first_word)
+                    | Q(text__icontains=first_word)
+                ).only('id', 'slug', 'title')[:20]),
+                number=5
+            ) / 5
+            print(
+                f'\nзаметок: {NOTES_COUNT}, запрос «{query}»: '
+                f'FTS5 {fts_time:.4f} c, icontains {icontains_time:.4f} c'
+            )
+
+
+@skipUnless(os.environ.get('BENCHMARK'), 'Нужна переменная BENCHMARK.')
+class TestSlugifyBenchmark(TestCase):
+
+    TITLES_COUNT = 100_000
+
+    def test_slugify_throughput(self):
+        """Свой slugify против pytils на уникальных и повторных заголовках."""
+        rand = random.Random(0)
+        unique_titles = [
+            ' '.join(rand.choices(WORDS, k=4)) + f' {index}'
+            for index in range(self.TITLES_COUNT)
+        ]
+        repeated_titles = rand.choices(WORDS, k=self.TITLES_COUNT)
+        for name, titles in (('уникальные', unique_titles),
+                             ('повторные', repeated_titles)):
+            slugify.cache_clear()
+            own_time = timeit(lambda: slugify_many(titles), number=1)
+            pytils_time = timeit(
+                lambda: [pytils_slugify(title) for title in titles],
+                number=1
+            )
+            print(
+                f'\n{name} заголовки, {len(titles)} шт.: '
+                f'свой {len(titles) / own_time:.0f}/с, '
+                f'pytils {len(titles) / pytils_time:.0f}/с'
+            )
+
+
+@skipUnless(os.environ.get('BENCHMARK'), 'Нужна переменная BENCHMARK.')
+class TestCompressionBenchmark(TestCase):
+
+    NOTES_COUNT = 20
+    REPEAT = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        rand = random.Random(0)
+        lines = []
+        while sum(map(len, lines)) < TEXT_KB * 1024:
+            lines.append(
+                f'2024-01-{rand.randint(1, 28):02} INFO '
+                f'{rand.choice(WORDS)} {rand.randint(0, 10 ** 6)}\n'
+            )
+        cls.log = ''.join(lines)
+
+    def measure(self):
+        """Размер колонки и время записи, чтения и списка заметок."""
+        Note.objects.all().delete()
+        save_time = timeit(
+            lambda: Note.objects.create(
+                author=self.author, title='Лог', text=self.log
+            ),
+            number=self.NOTES_COUNT
+        ) / self.NOTES_COUNT
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT sum(length(CAST(text AS BLOB))) FROM notes_note'
+            )
+            size = cursor.fetchone()[0] / self.NOTES_COUNT
+        note_id = Note.objects.values_list('id', flat=True).first()
+        read_time = timeit(
+            lambda: len(Note.objects.get(id=note_id).text),
+            number=self.REPEAT
+        ) / self.REPEAT
+        list_time = timeit(
+            lambda: list(NotesList.get_queryset(self.list_view())),
+            number=self.REPEAT
+        ) / self.REPEAT
+        return size, save_time, read_time, list_time
+
+    def list_view(self):
+        view = NotesList()
+        view.request = RequestFactory().get('/')
+        view.request.user = self.author
+        return view
+
+    def test_compression_tradeoffs(self):
+        """Сжатые и несжатые тексты: размер и задержки."""
+        for name, threshold in (('без сжатия', 2 ** 62),
+                                ('со сжатием', 4096)):
+            with override_settings(NOTES_TEXT_COMPRESS_THRESHOLD=threshold):
+                size, save_time, read_time, list_time = self.measure()
+            print(
+                f'\n{name}, текст {len(self.log.encode()) // 1024} КБ: '
+                f'в базе {size / 1024:.0f} КБ, '
+                f'запись {save_time * 1000:.1f} мс, '
+                f'чтение {read_time * 1000:.1f} мс, '
+                f'список {list_time * 1000:.1f} мс'
+            )
+
+
+@skipUnless(os.environ.get('BENCHMARK'), 'Нужна переменная BENCHMARK.')
+class TestTagsBenchmark(TestCase):
+
+    REPEAT = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        tags = Tag.objects.get_or_create_many(WORDS)
+        cls.tag_names = [tag.name for tag in tags]
+        rand = random.Random(0)
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            for start in range(0, TAGGED_NOTES_COUNT, BATCH_SIZE):
+                ids = range(start + 1, min(start + BATCH_SIZE,
+                                           TAGGED_NOTES_COUNT) + 1)
+                cursor.executemany(
+                    'INSERT INTO notes_note (id, title, text, slug, '
+                    'author_id, updated_at, html, html_hash, change) '
+                    'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                    [(pk, f'Заметка {pk}', 'Текст', f'n{pk}',
+                      cls.author.pk, now, '', '', pk) for pk in ids]
+                )
+                cursor.executemany(
+                    'INSERT INTO notes_notetag (note_id, tag_id, author_id) '
+                    'VALUES (%s, %s, %s)',
+                    [(pk, tag.pk, cls.author.pk) for pk in ids
+                     for tag in rand.sample(tags, TAGS_PER_NOTE)]
+                )
+
+    def measure(self, function):
+        return timeit(function, number=self.REPEAT) / self.REPEAT
+
+    def first_page(self, names, match_all):
+        notes = Note.objects.filter(author=self.author).tagged(
+            self.author, names, match_all
+        ).only('id', 'slug', 'title').order_by('id')
+        return list(notes[:50])
+
+    def test_tag_filters_and_counts(self):
+        """Фильтры по тегам и подсчёт заметок по тегам."""
+        names = self.tag_names[:2]
+        print(f'\nзаметок: {TAGGED_NOTES_COUNT}, тегов: {len(WORDS)}')
+        for label, match_all in (('все теги', True), ('любой тег', False)):
+            page_time = self.measure(
+                lambda: self.first_page(names, match_all)
+            )
+            print(f'{label} {names}: {page_time * 1000:.1f} мс')
+        counts_time = self.measure(
+            lambda: Tag.objects.counts_for(self.author)
+        )
+        per_tag_time = self.measure(lambda: [
+            NoteTag.objects.filter(author=self.author, tag__name=name).count()
+            for name in self.tag_names
+        ])
+        print(
+            f'число по тегам: один запрос {counts_time * 1000:.1f} мс, '
+            f'запрос на тег {per_tag_time * 1000:.1f} мс'
+        )
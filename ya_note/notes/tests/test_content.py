@@ -1,12 +1,29 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from notes.models import Note
+from django.utils.http import urlsafe_base64_encode
+from notes import models
+from notes.markdown import render_markdown
+from notes.models import Note, NoteTag, Tag
 from notes.forms import NoteForm
 
 User = get_user_model()
 
 LIST_URL = reverse('notes:list')
+PAGE_URL = reverse('notes:list_page')
+SEARCH_URL = reverse('notes:search')
+SYNC_URL = reverse('notes:sync')
+BATCH_URL = reverse('notes:batch')
+DETAIL_URL = 'notes:detail'
 ADD_URL = reverse('notes:add')
 EDIT_URL = 'notes:edit'
 
@@ -32,6 +49,12 @@ class TestContent(TestCase):
         cls.url_add = ADD_URL
         cls.url_edit = reverse(EDIT_URL, args=(cls.note.slug,))
 
+    def setUp(self):
+        # Кеш страниц не откатывается вместе с базой, а id
+        # пользователей повторяются: без очистки тест получил бы
+        # страницу предыдущего.
+        cache.clear()
+
     def test_note_in_list_for_author(self):
         """Отдельная заметка передаётся на страницу со списком заметок."""
         response = self.author_client.get(self.url_list)
@@ -57,3 +80,421 @@ class TestContent(TestCase):
         """На страницу редактирования заметки передаются формы."""
         response = self.author_client.get(self.url_edit)
         self.assertIn('form', response.context)
+
+
+@override_settings(NOTES_COUNT_ON_LIST_PAGE=2)
+class TestNotesListPages(TestCase):
+
+    NOTES_COUNT = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        Note.objects.bulk_create(
+            Note(author=cls.author, title=f'Заметка {index}',
+                 text='Длинный текст', slug=f'note-{index}')
+            for index in range(cls.NOTES_COUNT)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_notes_list_paginated_by_cursor(self):
+        """Список заметок отдаётся страницами, следующие страницы
+        подгружаются фрагментом по курсору.
+        """
+        # Сессия, пользователь, одна страница заметок и число по тегам.
+        with self.assertNumQueries(4):
+            response = self.author_client.get(LIST_URL)
+        pages = [response.context['object_list']]
+        next_cursor = response.context['next_cursor']
+        while next_cursor:
+            response = self.author_client.get(
+                PAGE_URL, {'after': next_cursor}
+            )
+            pages.append(response.context['object_list'])
+            next_cursor = response.context['next_cursor']
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [note.id for page in pages for note in page],
+            list(Note.objects.order_by('id').values_list('id', flat=True))
+        )
+
+    def test_notes_list_bad_cursor(self):
+        """Некорректный или слишком большой курсор даёт 404."""
+        for after in ('мусор', '-1', str(10 ** 20)):
+            with self.subTest(after=after):
+                response = self.author_client.get(PAGE_URL, {'after': after})
+                self.assertEqual(response.status_code, 404)
+
+    def test_notes_list_skips_text(self):
+        """Текст заметок в список не загружается."""
+        response = self.author_client.get(LIST_URL)
+        for note in response.context['object_list']:
+            self.assertIn('text', note.get_deferred_fields())
+
+
+@override_settings(NOTES_COUNT_ON_SEARCH_PAGE=2)
+class TestNoteSearch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader = User.objects.create(username='Читатель')
+        cls.best = Note.objects.create(
+            author=cls.author, title='Рецепт борща',
+            text='Борщ: свёкла, капуста. Борщ варить час.'
+        )
+        cls.other = Note.objects.create(
+            author=cls.author, title='Покупки', text='Свёкла для борща'
+        )
+        Note.objects.create(
+            author=cls.reader, title='Чужой борщ', text='Борщ'
+        )
+
+    def search(self, query, **params):
+        response = self.author_client.get(
+            SEARCH_URL, {'q': query, **params}
+        )
+        return [note.id for note in response.context['object_list']]
+
+    def test_search_ranked_and_scoped_by_author(self):
+        """Поиск находит только свои заметки, лучшие — первыми."""
+        self.assertEqual(
+            self.search('борщ'), [self.best.id, self.other.id]
+        )
+
+    def test_search_follows_changes(self):
+        """Индекс поиска следует за правкой и удалением заметок."""
+        self.other.text = 'Молоко'
+        self.other.save()
+        self.assertEqual(self.search('свёкла'), [self.best.id])
+        self.best.delete()
+        self.assertEqual(self.search('свёкла'), [])
+
+    def test_search_paginated(self):
+        """Результаты поиска разбиты на страницы."""
+        for index in range(3):
+            Note.objects.create(
+                author=self.author, title=f'Капуста {index}', text='Текст'
+            )
+        self.assertEqual(len(self.search('капуста')), 2)
+        self.assertEqual(len(self.search('капуста', page=2)), 2)
+        self.assertEqual(len(self.search('капуста', page=3)), 0)
+
+    def test_search_bad_page(self):
+        """Некорректный или слишком большой номер страницы даёт 404."""
+        for page in ('мусор', str(10 ** 20)):
+            with self.subTest(page=page):
+                response = self.author_client.get(
+                    SEARCH_URL, {'q': 'борщ', 'page': page}
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_search_ignores_fts_syntax(self):
+        """Спецсимволы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(
+            self.search('борщ" (*'), [self.best.id, self.other.id]
+        )
+
+    def test_rebuild_search_index(self):
+        """Команда rebuild_search_index заполняет индекс заново."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM notes_note_fts')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('борщ')), 2)
+
+
+@override_settings(NOTES_SYNC_PAGE_SIZE=2)
+class TestNotesSync(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        reader = User.objects.create(username='Читатель')
+        Note.objects.create(author=reader, title='Чужая', text='Текст')
+        cls.notes = [
+            Note.objects.create(
+                author=cls.author, title=f'Заметка {index}', text='Текст'
+            )
+            for index in range(3)
+        ]
+
+    def sync(self, since=None):
+        """Все страницы синхронизации: заметки, удаления и курсор."""
+        notes, deleted = [], []
+        while True:
+            data = {'since': since} if since else {}
+            changes = self.author_client.get(SYNC_URL, data).json()
+            notes += [note['id'] for note in changes['notes']]
+            deleted += changes['deleted']
+            since = changes['cursor']
+            if not changes['has_more']:
+                return notes, deleted, since
+
+    def test_sync_returns_only_changes(self):
+        """Повторная синхронизация отдаёт только изменения с курсора."""
+        notes, deleted, cursor = self.sync()
+        self.assertEqual(notes, [note.pk for note in self.notes])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.sync(cursor)[:2], ([], []))
+        changed, removed = self.notes[1], self.notes[2]
+        changed.text = 'Новый текст'
+        changed.save()
+        removed_id = removed.pk
+        removed.delete()
+        created = Note.objects.create(
+            author=self.author, title='Новая', text='Текст'
+        )
+        notes, deleted, _ = self.sync(cursor)
+        self.assertEqual(notes, [changed.pk, created.pk])
+        self.assertEqual(deleted, [removed_id])
+
+    def test_sync_independent_of_clock(self):
+        """Изменение со временем раньше курсора не пропускается:
+        так выглядит транзакция, взявшая время до выдачи курсора,
+        а зафиксированная после.
+        """
+        _, _, cursor = self.sync()
+        changed = self.notes[0]
+        changed.text = 'Новый текст'
+        with mock.patch(
+            'django.utils.timezone.now',
+            return_value=changed.updated_at - timedelta(minutes=1)
+        ):
+            changed.save()
+        self.assertEqual(self.sync(cursor)[0], [changed.pk])
+
+    def test_sync_bad_cursor(self):
+        """Некорректный курсор отклоняется."""
+        too_big = urlsafe_base64_encode(f'1|{10 ** 20}'.encode())
+        for since in ('мусор', too_big):
+            with self.subTest(since=since):
+                response = self.author_client.get(SYNC_URL, {'since': since})
+                self.assertEqual(response.status_code, 400)
+
+
+class TestAuthorPageCache(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader = User.objects.create(username='Читатель')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.note = Note.objects.create(
+            author=cls.author, title='Отпуск', text='Море', slug='otpusk'
+        )
+        cls.detail_url = reverse(DETAIL_URL, args=(cls.note.slug,))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_served_from_cache(self):
+        """Повторный запрос страниц не обращается к заметкам."""
+        for url in (LIST_URL, self.detail_url):
+            with self.subTest(url=url):
+                content = self.author_client.get(url).content
+                # Остаются только запросы сессии и пользователя.
+                with self.assertNumQueries(2):
+                    response = self.author_client.get(url)
+                self.assertEqual(response.content, content)
+
+    def test_cache_invalidated_by_changes(self):
+        """Изменения заметок автора сразу видны на его страницах."""
+        self.author_client.get(LIST_URL)
+        self.author_client.get(self.detail_url)
+        self.note.text = 'Горы'
+        self.note.save()
+        self.assertContains(self.author_client.get(self.detail_url), 'Горы')
+        self.author_client.post(
+            BATCH_URL, content_type='application/json',
+            data=json.dumps({'operations': [
+                {'op': 'create', 'title': 'Покупки', 'text': 'Хлеб'}
+            ]})
+        )
+        self.assertContains(self.author_client.get(LIST_URL), 'Покупки')
+
+    def test_cache_isolated_by_user(self):
+        """Пользователь не получает страницы, закешированные для автора."""
+        self.author_client.get(LIST_URL)
+        self.author_client.get(self.detail_url)
+        self.assertNotContains(self.reader_client.get(LIST_URL), 'Отпуск')
+        response = self.reader_client.get(self.detail_url)
+        self.assertEqual(response.status_code, 404)
+
+
+class TestNoteTags(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader = User.objects.create(username='Читатель')
+        cls.notes = {}
+        for title, tags in (('Отчёт', ('работа', 'срочно')),
+                            ('Звонок', ('работа',)),
+                            ('Борщ', ('дом', 'срочно')),
+                            ('Без тегов', ())):
+            note = Note.objects.create(
+                author=cls.author, title=title, text='Текст'
+            )
+            note.set_tags(tags)
+            cls.notes[title] = note
+        Note.objects.create(
+            author=cls.reader, title='Чужая', text='Текст'
+        ).set_tags(('работа',))
+
+    def setUp(self):
+        cache.clear()
+
+    def listed(self, **params):
+        response = self.author_client.get(LIST_URL, params)
+        return [note.title for note in response.context['object_list']]
+
+    def test_form_saves_tags(self):
+        """Теги из формы нормализуются и подставляются при правке."""
+        self.author_client.post(ADD_URL, data={
+            'title': 'Новая', 'text': 'Текст', 'tags': 'Дача, дом,, дача '
+        })
+        note = Note.objects.get(title='Новая')
+        self.assertEqual(
+            sorted(note.tags.values_list('name', flat=True)), ['дача', 'дом']
+        )
+        response = self.author_client.get(reverse(EDIT_URL, args=(note.slug,)))
+        self.assertEqual(response.context['form']['tags'].value(),
+                         'дача, дом')
+        self.assertEqual(Tag.objects.filter(name='дом').count(), 1)
+
+    def test_filter_by_tags(self):
+        """Фильтр по тегам: все теги сразу или любой из них."""
+        self.assertEqual(self.listed(tag='работа'), ['Отчёт', 'Звонок'])
+        self.assertEqual(
+            self.listed(tag=['работа', 'срочно']), ['Отчёт']
+        )
+        self.assertEqual(
+            self.listed(tag=['работа', 'дом'], match='any'),
+            ['Отчёт', 'Звонок', 'Борщ']
+        )
+        self.assertEqual(self.listed(tag='нет такого'), [])
+
+    def test_tag_counts_single_query(self):
+        """Число заметок по тегам считается одним запросом."""
+        with self.assertNumQueries(1):
+            counts = Tag.objects.counts_for(self.author)
+        self.assertEqual(
+            counts, [('дом', 1), ('работа', 2), ('срочно', 2)]
+        )
+        response = self.author_client.get(LIST_URL)
+        self.assertEqual(response.context['tag_counts'], counts)
+
+    def test_retagging_replaces_links(self):
+        """Новый набор тегов заменяет прежний."""
+        note = self.notes['Отчёт']
+        note.set_tags(('дом',))
+        self.assertEqual(
+            list(NoteTag.objects.filter(note=note).values_list(
+                'tag__name', flat=True
+            )),
+            ['дом']
+        )
+        self.assertEqual(self.listed(tag='дом'), ['Отчёт', 'Борщ'])
+
+
+class TestNoteMarkdown(TestCase):
+
+    TEXT = 'Список **дел**:\n\n- купить `хлеб`\n- <script>alert(1)</script>'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            author=cls.author, title='Дела', text=cls.TEXT, slug='dela'
+        )
+        cls.detail_url = reverse(DETAIL_URL, args=(cls.note.slug,))
+
+    def test_markdown_rendered_on_save(self):
+        """HTML отрисовывается при сохранении и выводится на странице."""
+        self.assertEqual(self.note.html, render_markdown(self.TEXT))
+        response = self.author_client.get(self.detail_url)
+        self.assertContains(response, '<strong>дел</strong>', html=True)
+        self.assertContains(response, '<code>хлеб</code>', html=True)
+        self.assertNotContains(response, '<script>')
+
+    def test_detail_does_not_render(self):
+        """Страница заметки не отрисовывает Markdown и не читает текст."""
+        with mock.patch.object(models, 'render_markdown') as render:
+            with CaptureQueriesContext(connection) as context:
+                self.author_client.get(self.detail_url)
+        render.assert_not_called()
+        self.assertTrue(all(
+            '"notes_note"."text"' not in query['sql']
+            for query in context.captured_queries
+        ))
+
+    def test_unchanged_text_not_rendered_again(self):
+        """Сохранение без изменения текста не перерисовывает HTML."""
+        with mock.patch.object(
+            models, 'render_markdown', wraps=render_markdown
+        ) as render:
+            self.note.title = 'Новые дела'
+            self.note.save()
+            render.assert_not_called()
+            self.note.text = 'Другой *текст*'
+            self.note.save()
+            render.assert_called_once()
+
+    def test_unsafe_markup_escaped(self):
+        """Сырой HTML экранируется, опасные ссылки не создаются."""
+        html = render_markdown(
+            '<img src=x onerror=alert(1)> [a](javascript:alert(1)) '
+            '[b](https://example.com/?q="x")'
+        )
+        self.assertNotIn('<img', html)
+        self.assertNotIn('href="javascript', html)
+        self.assertIn('href="https://example.com/?q=&quot;x&quot;"', html)
+
+    def test_markup_not_injected_into_link(self):
+        """Код и автоссылка в адресе ссылки не попадают в href."""
+        for text, inner in (
+            ('[x](/<http://a/onmouseover=alert(1)//>)',
+             '<a href="http://a/onmouseover=alert(1)//">'),
+            ('[x](/`a`)', '<code>a</code>'),
+        ):
+            with self.subTest(text=text):
+                html = render_markdown(text)
+                self.assertNotIn('href="/', html)
+                self.assertIn(f'[x](/{inner}', html)
+
+    def test_overlapping_emphasis_nested(self):
+        """Пересекающиеся выделения не дают перепутанных тегов."""
+        for text, html in (
+            ('**a _b** c_', '<p><strong>a _b</strong> c_</p>'),
+            ('*a **b** c*', '<p><em>a <strong>b</strong> c</em></p>'),
+            ('**a *b* c**', '<p><strong>a <em>b</em> c</strong></p>'),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(render_markdown(text), html)
+
+    def test_backfill_command(self):
+        """Команда заполняет HTML заметок, у которых его нет."""
+        Note.objects.update(html='', html_hash='')
+        out = StringIO()
+        call_command('render_notes', batch_size=1, stdout=out)
+        self.assertIn('перерисовано: 1', out.getvalue())
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.html, render_markdown(self.TEXT))
+        out = StringIO()
+        call_command('render_notes', stdout=out)
+        self.assertIn('перерисовано: 0', out.getvalue())
@@ -1,12 +1,35 @@
+import importlib
+import json
+import multiprocessing
+import pstats
+import random
+import string
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from types import SimpleNamespace
 from http import HTTPStatus
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from pytils.translit import slugify
 
-from notes.forms import WARNING
-from notes.models import Note
+from notes import fields
+from notes.forms import WARNING, NoteForm
+from notes.batch import NOT_FOUND
+from notes.metrics import Counter, Histogram, Registry, render
+from notes.profiling import make_profile_token
+from notes.models import DeletedNote, Note, NoteTag, Tag
+from notes.search import rebuild_index, search_notes
+from notes.slugs import slugify as note_slugify, slugify_many
 
 User = get_user_model()
 
@@ -16,10 +39,23 @@ ADD_URL = 'notes:add'
 DELETE_URL = 'notes:delete'
 EDIT_URL = 'notes:edit'
 DETAIL_URL = 'notes:detail'
+# Файлы, одинаковые в ya_news и ya_note, пути от каталога проектов.
+SHARED_FILES = (
+    ('ya_note/notes/metrics.py', 'ya_news/news/metrics.py'),
+    ('ya_note/notes/profiling.py', 'ya_news/news/profiling.py'),
+    ('ya_note/notes/timing.py', 'ya_news/news/timing.py'),
+    ('ya_note/notes/tests/query_budget.py',
+     'ya_news/news/pytest_tests/query_budget.py'),
+    ('ya_note/templates/notes/profiles.html',
+     'ya_news/templates/news/profiles.html'),
+)
 SUCCESS_URL = 'notes:success'
 LOGIN_URL = 'users:login'
 LOGOUT_URL = 'users:logout'
 SIGNUP_URL = 'users:signup'
+BATCH_URL = reverse('notes:batch')
+SEARCH_URL = reverse('notes:search')
+EXPORT_URL = reverse('notes:export')
 
 
 class TestNoteCreation(TestCase):
@@ -205,3 +241,570 @@ class TestEmptySlug(TestCase):
         new_note = Note.objects.get()
         expected_slug = slugify(self.form_data['title'])
         assert new_note, expected_slug
+
+
+class TestSlugAllocation(TestCase):
+
+    NOTE_TITLE = 'Заголовок заметки'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.slug = slugify(cls.NOTE_TITLE)
+        Note.objects.create(
+            author=cls.author, title=cls.NOTE_TITLE, text='Текст'
+        )
+        cls.url_add = reverse(ADD_URL)
+
+    def test_same_title_gets_suffix(self):
+        """Заметки с одинаковым заголовком получают slug с суффиксом."""
+        for expected_slug in (f'{self.slug}-2', f'{self.slug}-3'):
+            with self.subTest(slug=expected_slug):
+                response = self.author_client.post(
+                    self.url_add,
+                    data={'title': self.NOTE_TITLE, 'text': 'Текст'}
+                )
+                self.assertRedirects(response, reverse(SUCCESS_URL))
+                self.assertTrue(
+                    Note.objects.filter(slug=expected_slug).exists()
+                )
+
+    def test_allocate_slug_single_query(self):
+        """Свободный slug подбирается одним запросом."""
+        Note.objects.create(
+            author=self.author, title='Другая', text='Текст',
+            slug=f'{self.slug}-2'
+        )
+        with self.assertNumQueries(1):
+            slug = Note.objects.allocate_slug(self.slug)
+        self.assertEqual(slug, f'{self.slug}-3')
+
+    def test_allocate_slugs_bulk(self):
+        """Пакетный режим выдаёт уникальные slug без запроса на строку."""
+        bases = [self.slug, self.slug, 'novaya'] * 200
+        with self.assertNumQueries(1):
+            slugs = Note.objects.allocate_slugs(bases)
+        self.assertEqual(len(set(slugs)), len(bases))
+        self.assertNotIn(self.slug, slugs)
+        self.assertEqual(slugs[:3], [f'{self.slug}-2', f'{self.slug}-3',
+                                     'novaya'])
+
+    def test_concurrent_explicit_slug(self):
+        """Если slug заняли после проверки формы, форма вернёт ошибку."""
+        with mock.patch.object(
+            NoteForm, 'clean_slug', lambda form: form.cleaned_data['slug']
+        ), mock.patch.object(NoteForm, 'validate_unique'):
+            response = self.author_client.post(
+                self.url_add,
+                data={'title': 'Другая', 'text': 'Текст', 'slug': self.slug}
+            )
+        self.assertFormError(
+            response, form='form', field='slug', errors=self.slug + WARNING
+        )
+        self.assertEqual(Note.objects.count(), 1)
+
+
+class TestSlugify(TestCase):
+
+    CORPUS_SIZE = 20_000
+    CHARS = (
+        string.printable
+        + 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+        + 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+        + '‘’«»“”–—‒−…№  İßЇїÉé漢字😀'
+    )
+
+    def test_same_as_pytils(self):
+        """Свой slugify совпадает с pytils на большом наборе строк."""
+        rand = random.Random(0)
+        corpus = [
+            ''.join(rand.choices(self.CHARS, k=rand.randint(0, 60)))
+            for _ in range(self.CORPUS_SIZE)
+        ]
+        corpus += ['&amp;&&amp;amp;', '  -- a -_- b --  ', None, 42]
+        for value in corpus:
+            with self.subTest(value=value):
+                self.assertEqual(note_slugify(value), slugify(value))
+
+    def test_slugify_many(self):
+        """Пакетный slugify сохраняет порядок и повторы."""
+        titles = ['Список покупок', 'Отпуск', 'Список покупок']
+        self.assertEqual(
+            slugify_many(titles), ['spisok-pokupok', 'otpusk',
+                                   'spisok-pokupok']
+        )
+
+
+class TestNotesBatch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.reader = User.objects.create(username='Читатель')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            author=cls.author, title='Отпуск', text='Море', slug='otpusk'
+        )
+        cls.old_note = Note.objects.create(
+            author=cls.author, title='Старая', text='Текст', slug='staraya'
+        )
+        cls.reader_note = Note.objects.create(
+            author=cls.reader, title='Чужая', text='Текст', slug='chuzhaya'
+        )
+
+    def post_batch(self, operations):
+        response = self.author_client.post(
+            BATCH_URL, data=json.dumps({'operations': operations}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()['results']
+
+    def test_mixed_batch(self):
+        """Операции пакета применяются, ошибки возвращаются по каждой."""
+        results = self.post_batch([
+            {'op': 'create', 'title': 'Отпуск', 'text': 'Горы'},
+            {'op': 'create', 'title': 'Покупки', 'text': 'Хлеб',
+             'slug': 'staraya'},
+            {'op': 'update', 'id': self.note.pk, 'title': 'Отпуск летом'},
+            {'op': 'delete', 'id': self.old_note.pk},
+            {'op': 'delete', 'id': self.reader_note.pk},
+            {'op': 'create', 'title': 'Без текста'},
+            {'op': 'create', 'title': 'Повтор', 'text': 'Текст',
+             'slug': 'staraya'},
+            {'op': 'move'},
+        ])
+        created = Note.objects.get(text='Горы')
+        self.assertEqual(results[0], {
+            'status': 'created', 'id': created.pk, 'slug': 'otpusk-2'
+        })
+        self.assertEqual(results[1]['slug'], 'staraya')
+        self.assertEqual(results[2]['status'], 'updated')
+        self.assertEqual(results[3], {
+            'status': 'deleted', 'id': self.old_note.pk
+        })
+        self.assertEqual(results[4]['errors'], {'id': [NOT_FOUND]})
+        self.assertIn('text', results[5]['errors'])
+        self.assertEqual(results[6]['errors'], {'slug': ['staraya' + WARNING]})
+        self.assertIn('op', results[7]['errors'])
+        self.note.refresh_from_db()
+        self.assertEqual(
+            (self.note.title, self.note.text, self.note.slug),
+            ('Отпуск летом', 'Море', 'otpusk')
+        )
+        self.assertTrue(Note.objects.filter(pk=self.reader_note.pk).exists())
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 3)
+        found = search_notes(self.author, 'хлеб', 0, 10)
+        self.assertEqual([note.slug for note in found], ['staraya'])
+        self.assertEqual(search_notes(self.author, 'старая', 0, 10), [])
+
+    def test_delete_tagged_note(self):
+        """Удаление заметки с тегами убирает и её связи с тегами."""
+        self.note.set_tags(['отпуск', 'море'])
+        results = self.post_batch([{'op': 'delete', 'id': self.note.pk}])
+        self.assertEqual(results, [{'status': 'deleted', 'id': self.note.pk}])
+        self.assertFalse(Note.objects.filter(pk=self.note.pk).exists())
+        self.assertFalse(NoteTag.objects.filter(note_id=self.note.pk).exists())
+        self.assertTrue(
+            DeletedNote.objects.filter(note_id=self.note.pk).exists()
+        )
+
+    def test_chained_and_swapped_slugs(self):
+        """Slug можно передать по цепочке и обменять внутри пакета."""
+        third = Note.objects.create(
+            author=self.author, title='Третья', text='Текст', slug='tretya'
+        )
+        results = self.post_batch([
+            {'op': 'update', 'id': self.note.pk, 'slug': 'staraya'},
+            {'op': 'update', 'id': self.old_note.pk, 'slug': 'novaya'},
+        ])
+        self.assertEqual(
+            [result['status'] for result in results], ['updated'] * 2
+        )
+        results = self.post_batch([
+            {'op': 'update', 'id': self.note.pk, 'slug': 'tretya'},
+            {'op': 'update', 'id': third.pk, 'slug': 'staraya'},
+        ])
+        self.assertEqual(
+            [result['status'] for result in results], ['updated'] * 2
+        )
+        self.assertEqual(
+            dict(Note.objects.filter(author=self.author).values_list(
+                'pk', 'slug'
+            )),
+            {self.note.pk: 'tretya', self.old_note.pk: 'novaya',
+             third.pk: 'staraya'}
+        )
+
+    def test_rejected_rename_keeps_slug_taken(self):
+        """Slug отклонённого переименования не отдаётся другой операции."""
+        results = self.post_batch([
+            {'op': 'update', 'id': self.note.pk, 'slug': 'chuzhaya'},
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст',
+             'slug': 'otpusk'},
+        ])
+        self.assertEqual(
+            [result['errors'] for result in results],
+            [{'slug': ['chuzhaya' + WARNING]},
+             {'slug': ['otpusk' + WARNING]}]
+        )
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.slug, 'otpusk')
+
+    def test_large_batch_few_queries(self):
+        """Тысяча заметок создаётся за один запрос и несколько SQL."""
+        operations = [
+            {'op': 'create', 'title': 'Заметка', 'text': f'Текст {index}'}
+            for index in range(1000)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            results = self.post_batch(operations)
+        # Вставки идут пачками по лимиту SQLite в 999 параметров.
+        self.assertLessEqual(len(queries), 20)
+        slugs = {result['slug'] for result in results}
+        self.assertEqual(len(slugs), len(operations))
+        self.assertEqual(Note.objects.filter(slug__in=slugs).count(), 1000)
+
+    def test_large_delete_batch_few_queries(self):
+        """Тысяча заметок с тегами удаляется за несколько SQL."""
+        notes = Note.objects.bulk_create_notes([
+            Note(author=self.author, title='Заметка', text='Текст',
+                 slug=f'n{index}')
+            for index in range(1000)
+        ])
+        tag = Tag.objects.get_or_create_many(['тег'])[0]
+        NoteTag.objects.bulk_create(
+            NoteTag(note=note, tag=tag, author=self.author) for note in notes
+        )
+        with CaptureQueriesContext(connection) as queries:
+            results = self.post_batch([
+                {'op': 'delete', 'id': note.pk} for note in notes
+            ])
+        # Записи об удалении вставляются пачками по лимиту SQLite.
+        self.assertLessEqual(len(queries), 20)
+        self.assertEqual(
+            {result['status'] for result in results}, {'deleted'}
+        )
+        ids = [note.pk for note in notes]
+        self.assertFalse(Note.objects.filter(pk__in=ids).exists())
+        self.assertFalse(NoteTag.objects.filter(tag=tag).exists())
+        self.assertEqual(
+            DeletedNote.objects.filter(note_id__in=ids).count(), 1000
+        )
+
+    def test_bad_request(self):
+        """Некорректное тело запроса отклоняется целиком."""
+        for body in ('не json', '{}', '{"operations": {}}'):
+            with self.subTest(body=body):
+                response = self.author_client.post(
+                    BATCH_URL, data=body, content_type='application/json'
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+
+
+@override_settings(NOTES_TEXT_COMPRESS_THRESHOLD=100)
+class TestCompressedText(TestCase):
+
+    LONG_TEXT = 'строка лога\n' * 100
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            author=cls.author, title='Лог', text=cls.LONG_TEXT
+        )
+        cls.short_note = Note.objects.create(
+            author=cls.author, title='Короткая', text='Текст'
+        )
+
+    def stored(self, note):
+        """Тип и размер значения в колонке text."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT typeof(text), length(CAST(text AS BLOB)) '
+                'FROM notes_note WHERE id = %s', (note.pk,)
+            )
+            return cursor.fetchone()
+
+    def test_long_text_compressed(self):
+        """Длинный текст хранится сжатым, короткий — как есть."""
+        kind, size = self.stored(self.note)
+        self.assertEqual(kind, 'blob')
+        self.assertLess(size, len(self.LONG_TEXT.encode()))
+        self.assertEqual(self.stored(self.short_note)[0], 'text')
+        self.assertEqual(Note.objects.get(pk=self.note.pk).text,
+                         self.LONG_TEXT)
+
+    def test_text_decompressed_lazily(self):
+        """Список и сохранение без чтения текста ничего не распаковывают."""
+        with mock.patch.object(
+            fields, 'decompress_text', wraps=fields.decompress_text
+        ) as decompress:
+            self.author_client.get(reverse(LIST_URL))
+            note = Note.objects.get(pk=self.note.pk)
+            note.title = 'Новый заголовок'
+            note.save()
+            self.assertFalse(decompress.called)
+            self.author_client.get(reverse(DETAIL_URL, args=(note.slug,)))
+            self.assertTrue(decompress.called)
+        self.assertEqual(self.stored(self.note)[0], 'blob')
+        response = self.author_client.get(SEARCH_URL, {'q': 'лога'})
+        self.assertEqual(list(response.context['object_list']), [note])
+
+    def test_rebuild_index_reads_compressed_text(self):
+        """Перестроенный индекс содержит распакованные тексты."""
+        rebuild_index()
+        self.assertEqual(search_notes(self.author, 'лога', 0, 10), [self.note])
+
+    def test_migration_compresses_in_batches(self):
+        """Миграция сжимает длинные тексты и умеет их распаковать."""
+        migration = importlib.import_module(
+            'notes.migrations.0005_compress_note_text'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE notes_note SET text = %s WHERE id = %s',
+                (self.LONG_TEXT, self.note.pk)
+            )
+        editor = SimpleNamespace(connection=connection)
+        with mock.patch.object(migration, 'BATCH_SIZE', 1):
+            migration.compress_texts(apps, editor)
+            self.assertEqual(self.stored(self.note)[0], 'blob')
+            migration.decompress_texts(apps, editor)
+        self.assertEqual(self.stored(self.note)[0], 'text')
+        self.assertEqual(Note.objects.get(pk=self.note.pk).text,
+                         self.LONG_TEXT)
+
+
+class TestNotesExportImport(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader = User.objects.create(username='Читатель')
+        Note.objects.create(
+            author=cls.author, title='Отпуск', text='Море\n\nи горы',
+            slug='otpusk'
+        )
+        Note.objects.create(author=cls.author, title='Покупки', text='Хлеб')
+        Note.objects.create(author=cls.reader, title='Чужая', text='Текст')
+
+    def export(self):
+        response = self.author_client.get(EXPORT_URL)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return b''.join(response.streaming_content)
+
+    def test_export_zip_of_markdown(self):
+        """Архив содержит по файлу <slug>.md на каждую заметку автора."""
+        with zipfile.ZipFile(BytesIO(self.export())) as archive:
+            self.assertEqual(archive.namelist(), ['otpusk.md', 'pokupki.md'])
+            self.assertEqual(
+                archive.read('otpusk.md').decode(),
+                '# Отпуск\n\nМоре\n\nи горы'
+            )
+
+    def test_import_round_trip(self):
+        """Импорт архива создаёт заметки с уникальными slug."""
+        with tempfile.NamedTemporaryFile(suffix='.zip') as file:
+            file.write(self.export())
+            file.flush()
+            call_command(
+                'import_notes', file.name, author=self.reader.username,
+                batch_size=1, stdout=StringIO()
+            )
+        imported = Note.objects.filter(author=self.reader).exclude(
+            title='Чужая'
+        ).order_by('id')
+        self.assertEqual(
+            [(note.slug, note.title, note.text) for note in imported],
+            [('otpusk-2', 'Отпуск', 'Море\n\nи горы'),
+             ('pokupki-2', 'Покупки', 'Хлеб')]
+        )
+        found = search_notes(self.reader, 'горы', 0, 10)
+        self.assertEqual([note.slug for note in found], ['otpusk-2'])
+
+
+def metric_values(text):
+    return dict(
+        line.rsplit(' ', 1) for line in text.splitlines()
+        if not line.startswith('#')
+    )
+
+
+def record_in_child(counter, histogram):
+    for index in range(2000):
+        counter.inc((('worker', str(index)),))
+    histogram.observe((), 0.2)
+
+
+class TestMetrics(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+
+    def test_requests_counted_by_url_name(self):
+        """/metrics считает запросы и время ответа по имени URL."""
+        labels = 'url_name="notes:list",method="GET",status="200"'
+        counter = f'http_requests_total{{{labels}}}'
+        metrics_url = reverse('metrics')
+        before = metric_values(
+            self.client.get(metrics_url).content.decode()
+        )
+        self.author_client.get(reverse(LIST_URL))
+        self.author_client.get(reverse(LIST_URL))
+        response = self.client.get(metrics_url)
+        self.assertTrue(
+            response['Content-Type'].startswith('text/plain; version=0.0.4')
+        )
+        values = metric_values(response.content.decode())
+        self.assertEqual(
+            float(values[counter]) - float(before.get(counter, 0)), 2
+        )
+        buckets = [
+            name for name in values if name.startswith(
+                f'http_request_duration_seconds_bucket{{{labels}'
+            )
+        ]
+        self.assertEqual(len(buckets), 12)
+        self.assertTrue(buckets[-1].endswith('le="+Inf"}'))
+        self.assertEqual(values[buckets[-1]], values[
+            f'http_request_duration_seconds_count{{{labels}}}'
+        ])
+
+    def test_worker_processes_aggregated(self):
+        """Процессы после fork пишут свои файлы, а вывод их суммирует."""
+        with tempfile.TemporaryDirectory() as directory:
+            registry = Registry(directory)
+            counter = Counter(registry, 'jobs_total', 'Задачи.')
+            histogram = Histogram(registry, 'job_seconds', 'Время задачи.')
+            counter.inc((('worker', '0'),))
+            histogram.observe((), 0.02)
+            child = multiprocessing.get_context('fork').Process(
+                target=record_in_child, args=(counter, histogram)
+            )
+            child.start()
+            child.join()
+            self.assertEqual(child.exitcode, 0)
+            self.assertEqual(
+                len(list(Path(directory).glob('metrics_*.db'))), 2
+            )
+            values = metric_values(render(registry, {
+                'jobs_total': counter, 'job_seconds': histogram
+            }))
+        self.assertEqual(values['jobs_total{worker="0"}'], '2.0')
+        self.assertEqual(values['jobs_total{worker="1999"}'], '1.0')
+        self.assertEqual(values['job_seconds_bucket{le="0.025"}'], '1.0')
+        self.assertEqual(values['job_seconds_bucket{le="0.25"}'], '2.0')
+        self.assertEqual(values['job_seconds_count'], '2.0')
+
+
+class TestProfiling(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.staff = User.objects.create(username='Сотрудник', is_staff=True)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.staff_client = Client()
+        cls.staff_client.force_login(cls.staff)
+        cls.add_url = reverse(ADD_URL)
+        cls.profiles_url = reverse('notes:profiles')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profile_dir = Path(directory.name)
+        settings = override_settings(NOTES_PROFILE_DIR=self.profile_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_staff_request_profiled(self):
+        """Запрос сотрудника с profile сохраняет профиль, видный в списке."""
+        response = self.staff_client.post(
+            f'{self.add_url}?profile=1',
+            {'title': 'Заголовок', 'text': 'Текст'}
+        )
+        name = response['X-Profile']
+        self.assertTrue(name.startswith('notes.add__'))
+        self.assertTrue(name.endswith('.prof'))
+        self.assertTrue(Note.objects.filter(author=self.staff).exists())
+        stats = pstats.Stats(str(self.profile_dir / name))
+        self.assertGreater(stats.total_calls, 0)
+        response = self.staff_client.get(self.profiles_url)
+        self.assertEqual(response.context['profiles'][0]['name'], name)
+        profile_url = reverse('notes:profile', args=(name,))
+        self.assertContains(response, f'href="{profile_url}"')
+        response = self.staff_client.get(profile_url)
+        self.assertTrue(
+            response['Content-Disposition'].startswith('attachment')
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content),
+            (self.profile_dir / name).read_bytes()
+        )
+
+    @override_settings(NOTES_PROFILE_SAMPLE_INTERVAL=0.0001)
+    def test_sampling_profile_is_folded(self):
+        """profile=sample сохраняет стеки в формате flamegraph.pl."""
+        response = self.staff_client.get(self.add_url, {'profile': 'sample'})
+        name = response['X-Profile']
+        self.assertTrue(name.endswith('.folded'))
+        for line in (self.profile_dir / name).read_text().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+            self.assertIn(';', stack)
+
+    def test_profile_needs_staff_or_token(self):
+        """Остальным пользователям нужна подпись пути в profile_token."""
+        cases = (
+            ({'profile': '1'}, False),
+            ({'profile': '1', 'profile_token': make_profile_token(HOME_URL)},
+             False),
+            ({'profile': '1',
+              'profile_token': make_profile_token(self.add_url)}, True),
+        )
+        for params, profiled in cases:
+            with self.subTest(params=params):
+                response = self.author_client.get(self.add_url, params)
+                self.assertEqual(response.has_header('X-Profile'), profiled)
+        response = self.author_client.get(self.profiles_url)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    @override_settings(NOTES_PROFILE_KEEP=2)
+    def test_old_profiles_pruned(self):
+        names = [
+            self.staff_client.get(HOME_URL, {'profile': '1'})['X-Profile']
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            sorted(path.name for path in self.profile_dir.iterdir()),
+            sorted(names[1:])
+        )
+
+
+class TestSharedFiles(TestCase):
+
+    def test_shared_files_not_diverged(self):
+        """Общие с ya_news модули и шаблон совпадают с их копиями."""
+        root = settings.BASE_DIR.parent
+        for path, copy in SHARED_FILES:
+            with self.subTest(path=path):
+                if not (root / copy).is_file():
+                    self.skipTest('Рядом нет проекта ya_news.')
+                self.assertEqual(
+                    (root / path).read_bytes(), (root / copy).read_bytes()
+                )
@@ -0,0 +1,86 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes.models import Note
+from notes.search import rebuild_index
+from notes.tests.query_budget import QueryBudget
+
+User = get_user_model()
+
+# Объём данных: заметок автора и операций в пакете.
+VOLUMES = (1, 20)
+TAGS = ('работа', 'дом')
+
+
+class TestQueryBudgets(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.anonymous_client = Client()
+
+    def add_notes(self, count):
+        notes = []
+        for index in range(count):
+            note = Note.objects.create(
+                author=self.author,
+                title=f'Заметка {index}',
+                text='Текст про **борщ**'
+            )
+            note.set_tags(TAGS)
+            notes.append(note)
+        rebuild_index()
+        return notes
+
+    def test_query_budgets(self):
+        """Число запросов страниц не растёт вместе с объёмом данных."""
+        added = 0
+        for volume in VOLUMES:
+            notes = self.add_notes(volume - added)
+            added = volume
+            slug = (notes[0].slug,)
+            operations = [
+                {'op': 'update', 'id': note.pk, 'title': 'Новый заголовок'}
+                for note in Note.objects.filter(author=self.author)
+            ]
+            urls = (
+                ('notes:home', None, {}, 2),
+                ('notes:add', None, {}, 2),
+                ('notes:edit', slug, {}, 4),
+                ('notes:detail', slug, {}, 4),
+                ('notes:delete', slug, {}, 3),
+                ('notes:list', None, {}, 4),
+                ('notes:list', None, {'tag': TAGS}, 4),
+                ('notes:list_page', None, {'tag': TAGS}, 3),
+                ('notes:success', None, {}, 2),
+                ('notes:batch', None, {'operations': operations}, 11),
+                ('notes:sync', None, {}, 5),
+                ('notes:export', None, {}, 3),
+                ('notes:search', None, {'q': 'борщ'}, 3),
+                ('users:logout', None, {}, 4),
+            )
+            for name, args, params, budget in urls:
+                with self.subTest(volume=volume, name=name, params=params):
+                    url = reverse(name, args=args)
+                    with QueryBudget(budget):
+                        if name == 'notes:batch':
+                            self.author_client.post(
+                                url, json.dumps(params),
+                                content_type='application/json'
+                            )
+                        else:
+                            response = self.author_client.get(url, params)
+                            if response.streaming:
+                                b''.join(response.streaming_content)
+            self.author_client.force_login(self.author)
+
+    @QueryBudget(0)
+    def test_anonymous_auth_pages(self):
+        """Страницы входа и регистрации не обращаются к базе."""
+        for name in ('users:login', 'users:signup'):
+            self.anonymous_client.get(reverse(name))
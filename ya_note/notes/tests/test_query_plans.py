@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note
+
+User = get_user_model()
+
+LIST_URL = 'notes:list'
+DETAIL_URL = 'notes:detail'
+EDIT_URL = 'notes:edit'
+DELETE_URL = 'notes:delete'
+SYNC_URL = 'notes:sync'
+
+
+def explain(sql):
+    """План выполнения запроса в SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_bad_step(step):
+    """Полный просмотр таблицы или сортировка во временном B-дереве."""
+    full_scan = step.startswith('SCAN ') and ' USING ' not in step
+    return full_scan or 'USE TEMP B-TREE' in step
+
+
+class TestQueryPlans(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            author=cls.author,
+            title='Заголовок',
+            text='Текст',
+            slug='pasport'
+        )
+        cls.note.set_tags(('работа', 'дом'))
+
+    def test_queries_use_indexes(self):
+        """Запросы страниц заметок не просматривают таблицы целиком
+        и не сортируют результат во временном B-дереве.
+        """
+        urls = (
+            (LIST_URL, None, {}),
+            (LIST_URL, None, {'tag': ['работа', 'дом']}),
+            (LIST_URL, None, {'tag': ['работа', 'дом'], 'match': 'any'}),
+            (DETAIL_URL, (self.note.slug,), {}),
+            (EDIT_URL, (self.note.slug,), {}),
+            (DELETE_URL, (self.note.slug,), {}),
+            (SYNC_URL, None, {}),
+        )
+        for name, args, params in urls:
+            with self.subTest(name=name, params=params):
+                with CaptureQueriesContext(connection) as context:
+                    self.author_client.get(reverse(name, args=args), params)
+                self.assertTrue(context.captured_queries)
+                for query in context.captured_queries:
+                    plan = explain(query['sql'])
+                    self.assertFalse(
+                        any(map(is_bad_step, plan)), (query['sql'], plan)
+                    )
@@ -1,7 +1,10 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from django.urls import reverse
 from notes.models import Note
@@ -11,6 +14,7 @@ User = get_user_model()
 HOME_URL = reverse('notes:home')
 LIST_URL = 'notes:list'
 ADD_URL = 'notes:add'
+EXPORT_URL = 'notes:export'
 DELETE_URL = 'notes:delete'
 EDIT_URL = 'notes:edit'
 DETAIL_URL = 'notes:detail'
@@ -20,6 +24,14 @@ LOGOUT_URL = 'users:logout'
 SIGNUP_URL = 'users:signup'
 
 
+def parse_server_timing(header):
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
 class TestRoutes(TestCase):
 
     @classmethod
@@ -35,6 +47,12 @@ class TestRoutes(TestCase):
             slug='pasport'
         )
 
+    def setUp(self):
+        # Кеш страниц не откатывается вместе с базой, а id
+        # пользователей повторяются: без очистки тест получил бы
+        # страницу предыдущего.
+        cache.clear()
+
     def test_home_page(self):
         """Главная страница доступна анонимному пользователю."""
         response = self.client.get(HOME_URL)
@@ -68,6 +86,7 @@ class TestRoutes(TestCase):
             (LIST_URL, None),
             (SUCCESS_URL, None),
             (ADD_URL, None),
+            (EXPORT_URL, None),
         )
         for name, args in urls:
             with self.subTest(name=name):
@@ -97,3 +116,30 @@ class TestRoutes(TestCase):
                 url = reverse(name, args=args)
                 response = self.author_client.get(url)
                 self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(NOTES_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Server-Timing делит общее время на SQL, шаблоны и Python."""
+        url = reverse(DETAIL_URL, args=(self.note.slug,))
+        client = Client()
+        client.force_login(self.author)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(set(metrics), {'db', 'tpl', 'app', 'total'})
+        self.assertEqual(
+            metrics['db']['desc'], f'"{len(context.captured_queries)} queries"'
+        )
+        durations = {name: float(metric['dur'])
+                     for name, metric in metrics.items()}
+        self.assertGreater(durations['tpl'], 0)
+        self.assertAlmostEqual(
+            durations['db'] + durations['tpl'] + durations['app'],
+            durations['total'], delta=0.05
+        )
+
+    @override_settings(NOTES_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        response = Client().get(HOME_URL)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.has_header('Server-Timing'))
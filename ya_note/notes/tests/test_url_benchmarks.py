@@ -0,0 +1,205 @@
+"""Задержка и число SQL-запросов всех именованных URL.
+
+Не входят в обычный прогон тестов, запускаются так:
+BENCHMARK=1 pytest -s notes/tests/test_url_benchmarks.py
+С BENCHMARK_UPDATE=1 результаты записываются в url_benchmarks.json
+как новая базовая линия. Без него прогон падает, если медиана (p50)
+какого-либо URL выросла больше чем на долю BENCHMARK_THRESHOLD
+(по умолчанию 0.5) или запросов к базе стало больше, чем в базовой
+линии. p95 только выводится: на десятках замеров это почти максимум,
+и одна пауза сборщика мусора роняла бы прогон.
+Каждый запрос делается с пустым кешем, то есть замеряется худший случай.
+"""
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note, NoteTag, Tag
+from notes.search import rebuild_index
+from notes.urls import app_name, urlpatterns
+from yanote.urls import auth_urls
+
+User = get_user_model()
+
+BASELINE_FILE = Path(__file__).with_name('url_benchmarks.json')
+REPEAT = int(os.environ.get('BENCHMARK_REPEAT', 50))
+THRESHOLD = float(os.environ.get('BENCHMARK_THRESHOLD', 0.5))
+# Абсолютный допуск, чтобы шум не ронял быстрые страницы.
+NOISE_MS = 5.0
+NOTES_COUNT = 5000
+TAGS_PER_NOTE = 3
+WORDS = (
+    'заметка', 'список', 'покупки', 'молоко', 'хлеб', 'встреча', 'проект',
+    'отчёт', 'звонок', 'идея', 'книга', 'фильм', 'рецепт', 'борщ', 'отпуск',
+)
+
+
+def named_urls():
+    """Имена всех URL приложения notes и страниц пользователей."""
+    patterns, users_namespace = auth_urls
+    return {
+        f'{app_name}:{pattern.name}' for pattern in urlpatterns
+    } | {
+        f'{users_namespace}:{pattern.name}' for pattern in patterns
+    }
+
+
+def percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+def fetch(client, url, spec):
+    if 'json' in spec:
+        response = client.post(
+            url, json.dumps(spec['json']), content_type='application/json'
+        )
+    else:
+        response = client.get(url, spec.get('params'))
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, url, spec):
+    """p50, p95 в миллисекундах и число запросов для URL."""
+    login = spec.get('login')
+    timings = []
+    for _ in range(REPEAT):
+        cache.clear()
+        if login:
+            client.force_login(login)
+        started = time.perf_counter()
+        fetch(client, url, spec)
+        timings.append((time.perf_counter() - started) * 1000)
+    cache.clear()
+    if login:
+        client.force_login(login)
+    with CaptureQueriesContext(connection) as context:
+        fetch(client, url, spec)
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': len(context.captured_queries),
+    }
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {result["queries"]}'
+            )
+        limit = base['p50_ms'] * (1 + THRESHOLD) + NOISE_MS
+        if result['p50_ms'] > limit:
+            regressions.append(
+                f'{name}: p50 {base["p50_ms"]} -> {result["p50_ms"]} мс'
+            )
+    return regressions
+
+
+@skipUnless(os.environ.get('BENCHMARK'), 'Нужна переменная BENCHMARK.')
+class TestUrlBenchmarks(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        rand = random.Random(0)
+        notes = []
+        for index in range(NOTES_COUNT):
+            note = Note(
+                author=cls.author,
+                title=' '.join(rand.choices(WORDS, k=3)),
+                text='\n\n'.join(
+                    ' '.join(rand.choices(WORDS, k=20)) for _ in range(5)
+                ),
+                slug=f'n{index}'
+            )
+            note.render_html()
+            notes.append(note)
+        notes = Note.objects.bulk_create_notes(notes)
+        tags = Tag.objects.get_or_create_many(WORDS)
+        NoteTag.objects.bulk_create(
+            NoteTag(note=note, tag=tag, author=cls.author)
+            for note in notes for tag in rand.sample(tags, TAGS_PER_NOTE)
+        )
+        rebuild_index()
+        cls.note = notes[0]
+        cls.tag_names = [tag.name for tag in tags[:2]]
+
+    def test_url_benchmarks(self):
+        """Все URL укладываются в базовую линию по задержке и запросам."""
+        clients = {'anonymous': Client(), 'author': Client(),
+                   'staff': Client(), 'logout': Client()}
+        clients['author'].force_login(self.author)
+        clients['staff'].force_login(
+            User.objects.create(username='Сотрудник', is_staff=True)
+        )
+        slug = (self.note.slug,)
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        settings = override_settings(NOTES_PROFILE_DIR=profile_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        profile = clients['staff'].get(
+            reverse('notes:home'), {'profile': '1'}
+        )['X-Profile']
+        specs = {
+            'notes:home': {},
+            'notes:add': {},
+            'notes:edit': {'args': slug},
+            'notes:detail': {'args': slug},
+            'notes:delete': {'args': slug},
+            'notes:list': {},
+            'notes:list_page': {'params': {'tag': self.tag_names}},
+            'notes:success': {},
+            'notes:batch': {'json': {'operations': [
+                {'op': 'update', 'id': self.note.pk, 'title': 'Заголовок'}
+            ]}},
+            'notes:sync': {},
+            'notes:export': {},
+            'notes:search': {'params': {'q': 'борщ'}},
+            'notes:profiles': {'client': 'staff'},
+            'notes:profile': {'args': (profile,), 'client': 'staff'},
+            'users:login': {'client': 'anonymous'},
+            'users:logout': {'client': 'logout', 'login': self.author},
+            'users:signup': {'client': 'anonymous'},
+        }
+        self.assertEqual(
+            set(specs), named_urls(),
+            f'Добавьте в замер новые URL: '
+            f'{sorted(named_urls() - set(specs))}'
+        )
+        results = {}
+        for name, spec in specs.items():
+            client = clients[spec.get('client', 'author')]
+            url = reverse(name, args=spec.get('args'))
+            results[name] = measure(client, url, spec)
+            print(f'\n{name}: {results[name]}', end='')
+        if os.environ.get('BENCHMARK_UPDATE'):
+            BASELINE_FILE.write_text(
+                json.dumps(results, ensure_ascii=False, indent=2) + '\n'
+            )
+            return
+        baseline = {}
+        if BASELINE_FILE.exists():
+            baseline = json.loads(BASELINE_FILE.read_text())
+        regressions = find_regressions(results, baseline)
+        self.assertFalse(regressions, '\n'.join(regressions))
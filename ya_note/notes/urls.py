@@ -11,5 +11,16 @@ urlpatterns = [
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('notes/page/', views.NotesPage.as_view(), name='list_page'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path('api/batch/', views.NotesBatch.as_view(), name='batch'),
+    path('api/sync/', views.NotesSync.as_view(), name='sync'),
+    path('export/', views.NotesExport.as_view(), name='export'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('profiles/', views.ProfileList.as_view(), name='profiles'),
+    path(
+        'profiles/<str:name>/',
+        views.ProfileDownload.as_view(),
+        name='profile'
+    ),
 ]
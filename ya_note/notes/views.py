@@ -1,9 +1,27 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.db import IntegrityError
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
 from django.urls import reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
-from .models import Note
+from .batch import NoteBatch
+from .cache import get_author_page, get_author_version, set_author_page
+from .export import export_notes
+from .forms import TAGS_SEPARATOR, WARNING, NoteForm, parse_tags
+from .metrics import CONTENT_TYPE, render_metrics
+from .profiling import PROFILE_NAME, list_profiles
+from .models import Note, Tag
+from .search import search_notes
+from .sync import get_changes
+
+# Наибольшее целое SQLite; большие числа в запросе поднимают OverflowError.
+MAX_SQL_INTEGER = 2 ** 63 - 1
 
 
 class Home(generic.TemplateView):
@@ -26,22 +44,55 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class AuthorCacheMixin:
+    """Кеширует страницу в пространстве имён пользователя.
+
+    Ключ включает id пользователя и полный путь запроса, а версия
+    меняется при любом изменении его заметок, поэтому страница
+    отдаётся из кеша, пока заметки не изменились, и только ему.
+    """
+
+    def get(self, request, *args, **kwargs):
+        user_id = request.user.pk
+        path = request.get_full_path()
+        version = get_author_version(user_id)
+        content = get_author_page(user_id, path, version)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda response: set_author_page(
+                    user_id, path, version, response.content
+                )
+            )
+        return response
+
+
+class NoteFormBase(NoteBase):
+    """Базовый класс для создания и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """Slug мог занять параллельный запрос уже после проверки формы."""
+        try:
+            return super().form_valid(form)
+        except IntegrityError:
+            form.add_error('slug', form.instance.slug + WARNING)
+            return self.form_invalid(form)
+
+
+class NoteCreate(NoteFormBase, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteFormBase, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
@@ -49,11 +100,199 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
-class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+class NotesList(NoteBase, AuthorCacheMixin, generic.ListView):
+    """Список заметок пользователя.
+
+    Заметки выдаются страницами по курсору ``after`` (id последней
+    заметки предыдущей страницы) и только с нужными шаблону полями.
+    Параметры ``tag`` оставляют заметки со всеми указанными тегами,
+    а с ``match=any`` — хотя бы с одним из них.
+    """
     template_name = 'notes/list.html'
+    show_tag_counts = True
+
+    def get_queryset(self):
+        notes = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+        self.tag_names = parse_tags(
+            TAGS_SEPARATOR.join(self.request.GET.getlist('tag'))
+        )
+        self.match_all = self.request.GET.get('match') != 'any'
+        if self.tag_names:
+            notes = notes.tagged(
+                self.request.user, self.tag_names, self.match_all
+            )
+        after = self.request.GET.get('after')
+        if after:
+            try:
+                after = int(after)
+            except ValueError:
+                after = None
+            if after is None or not 0 <= after <= MAX_SQL_INTEGER:
+                raise Http404('Некорректный курсор заметок.')
+            notes = notes.filter(id__gt=after)
+        return notes
+
+    def get_context_data(self, **kwargs):
+        per_page = settings.NOTES_COUNT_ON_LIST_PAGE
+        notes = list(self.object_list[:per_page + 1])
+        next_cursor = None
+        if len(notes) > per_page:
+            notes = notes[:per_page]
+            next_cursor = notes[-1].id
+        filter_query = self.request.GET.copy()
+        filter_query.pop('after', None)
+        if self.show_tag_counts:
+            kwargs['tag_counts'] = Tag.objects.counts_for(self.request.user)
+        return super().get_context_data(
+            object_list=notes,
+            next_cursor=next_cursor,
+            filter_query=filter_query.urlencode(),
+            tag_names=self.tag_names,
+            **kwargs
+        )
+
 
+class NotesPage(NotesList):
+    """Фрагмент со следующей страницей списка заметок."""
+    template_name = 'notes/includes/list_items.html'
+    show_tag_counts = False
 
-class NoteDetail(NoteBase, generic.DetailView):
-    """Заметка подробно."""
+
+class NoteDetail(NoteBase, AuthorCacheMixin, generic.DetailView):
+    """Заметка подробно.
+
+    Выводится HTML, отрисованный при сохранении, а сам текст
+    не загружается.
+    """
     template_name = 'notes/detail.html'
+
+    def get_queryset(self):
+        return super().get_queryset().defer('text')
+
+
+class NoteSearch(NoteBase, generic.TemplateView):
+    """Поиск по заметкам пользователя с ранжированием по bm25."""
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        per_page = settings.NOTES_COUNT_ON_SEARCH_PAGE
+        try:
+            page = max(int(self.request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = None
+        if page is None or (page - 1) * per_page > MAX_SQL_INTEGER:
+            raise Http404('Некорректный номер страницы.')
+        notes = search_notes(
+            self.request.user, query, (page - 1) * per_page, per_page + 1
+        )
+        context.update(
+            query=query,
+            object_list=notes[:per_page],
+            previous_page=page - 1 if page > 1 else None,
+            next_page=page + 1 if len(notes) > per_page else None,
+        )
+        return context
+
+
+class NotesBatch(LoginRequiredMixin, generic.View):
+    """Пакетное создание, изменение и удаление заметок.
+
+    Принимает JSON ``{"operations": [...]}`` и возвращает результаты
+    операций в том же порядке; формат операций описан в NoteBatch.
+    """
+
+    def post(self, request):
+        try:
+            operations = json.loads(request.body)['operations']
+        except (ValueError, KeyError, TypeError):
+            operations = None
+        if not isinstance(operations, list):
+            return JsonResponse(
+                {'error': 'Ожидается JSON вида {"operations": [...]}.'},
+                status=400
+            )
+        max_operations = settings.NOTES_BATCH_MAX_OPERATIONS
+        if len(operations) > max_operations:
+            return JsonResponse(
+                {'error': f'Не больше {max_operations} операций в пакете.'},
+                status=400
+            )
+        try:
+            results = NoteBatch(request.user, operations).apply()
+        except IntegrityError:
+            return JsonResponse(
+                {'error': 'Slug заняли во время записи, повторите пакет.'},
+                status=409
+            )
+        return JsonResponse({'results': results})
+
+
+class NotesSync(LoginRequiredMixin, generic.View):
+    """Заметки, изменённые и удалённые после курсора ``since``.
+
+    Клиент запрашивает страницы, передавая полученный ``cursor``,
+    пока ``has_more`` не станет ложным, и сохраняет последний курсор
+    до следующей синхронизации.
+    """
+
+    def get(self, request):
+        try:
+            changes = get_changes(
+                request.user, request.GET.get('since'),
+                settings.NOTES_SYNC_PAGE_SIZE
+            )
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Некорректный курсор синхронизации.'}, status=400
+            )
+        return JsonResponse(changes)
+
+
+class NotesExport(LoginRequiredMixin, generic.View):
+    """Все заметки пользователя zip-архивом файлов ``<slug>.md``."""
+
+    def get(self, request):
+        response = StreamingHttpResponse(
+            export_notes(request.user), content_type='application/zip'
+        )
+        response['Content-Disposition'] = 'attachment; filename="notes.zip"'
+        return response
+
+
+class StaffMixin(LoginRequiredMixin, UserPassesTestMixin):
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class ProfileList(StaffMixin, generic.TemplateView):
+    """Последние сохранённые профили запросов."""
+    template_name = 'notes/profiles.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = list_profiles(
+            Path(settings.NOTES_PROFILE_DIR), settings.NOTES_PROFILE_KEEP
+        )
+        return context
+
+
+class ProfileDownload(StaffMixin, generic.View):
+    """Файл профиля для pstats, snakeviz или flamegraph.pl."""
+
+    def get(self, request, name):
+        path = Path(settings.NOTES_PROFILE_DIR) / name
+        if not PROFILE_NAME.match(name) or not path.is_file():
+            raise Http404('Профиль не найден.')
+        return FileResponse(path.open('rb'), as_attachment=True)
+
+
+class Metrics(generic.View):
+    """Метрики запросов всех процессов в формате Prometheus."""
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -22,11 +22,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.metrics.MetricsMiddleware',
+    'notes.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'notes.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,3 +90,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_LIST_PAGE = 50
+NOTES_COUNT_ON_SEARCH_PAGE = 20
+NOTES_BATCH_MAX_OPERATIONS = 1000
+NOTES_SYNC_PAGE_SIZE = 500
+# Тексты заметок длиннее этого числа байт хранятся сжатыми.
+NOTES_TEXT_COMPRESS_THRESHOLD = 4096
+
+# Заголовок Server-Timing с временем SQL, шаблонов и Python.
+# Выключенный не добавляет накладных расходов.
+NOTES_SERVER_TIMING = DEBUG
+
+# Каталог файлов метрик для /metrics при нескольких процессах-воркерах,
+# общий для всех воркеров и очищаемый при перезапуске. Без него каждый
+# процесс отдаёт только свои метрики.
+NOTES_METRICS_DIR = None
+
+# Профили запросов с параметром profile, см. notes/profiling.py.
+NOTES_PROFILE_DIR = BASE_DIR / 'profiles'
+NOTES_PROFILE_KEEP = 100
+NOTES_PROFILE_SAMPLE_INTERVAL = 0.005
+NOTES_PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Для нескольких процессов-воркеров locmem стоит заменить на
+# django.core.cache.backends.filebased.FileBasedCache, иначе версии кеша
+# авторов будут своими в каждом процессе.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+NOTES_PAGE_CACHE_TIMEOUT = 60 * 60